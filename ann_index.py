@@ -0,0 +1,256 @@
+import os
+import time
+import numpy as np
+from face_matcher import FaceMatcher, as_encoding_matrix, make_matcher
+
+INDEX_FILE = 'ann_index.npz'
+MIN_INDEX_SIZE = 5000  # Below this an exact scan is already fast enough
+
+
+def _squared_distances(a, b, b_norms=None):
+    """Squared euclidean distances between the rows of a and b"""
+    if b_norms is None:
+        b_norms = np.einsum('ij,ij->i', b, b)
+    a_norms = np.einsum('ij,ij->i', a, a)
+    squared = a_norms[:, None] + b_norms[None, :] - 2.0 * (a @ b.T)
+    return np.maximum(squared, 0.0, out=squared)
+
+
+def kmeans(data, k, iterations=20, seed=0, chunk_size=8192):
+    """
+    Plain Lloyd's k-means, returns (centroids, assignments)
+    """
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    assignments = np.zeros(len(data), dtype=np.intp)
+
+    for _ in range(iterations):
+        centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+        for start in range(0, len(data), chunk_size):
+            chunk = data[start:start + chunk_size]
+            assignments[start:start + chunk_size] = np.argmin(
+                _squared_distances(chunk, centroids, centroid_norms), axis=1)
+
+        counts = np.bincount(assignments, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, data)
+
+        # Reseed empty clusters with random points
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+
+    return centroids, assignments
+
+
+class IVFIndex:
+    """
+    Approximate nearest-neighbour index over face encodings.
+
+    Encodings are clustered with k-means and stored grouped by cluster
+    (inverted lists). A search only scans the `nprobe` lists whose centroids
+    are closest to the query, so nprobe trades recall for speed.
+    """
+
+    def __init__(self, centroids, offsets, encodings, rows, rolls, tolerance=0.6, nprobe=8):
+        self.centroids = centroids
+        self.offsets = offsets      # list i holds encodings[offsets[i]:offsets[i + 1]]
+        self.encodings = encodings  # grouped by list
+        self.rows = rows            # roster row of each grouped encoding
+        self.rolls = rolls          # roll numbers in roster order
+        self.norms = np.einsum('ij,ij->i', encodings, encodings)
+        self.tolerance = tolerance
+        self.nprobe = nprobe
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def build(cls, known_encodings, known_rolls, n_lists=None, iterations=20, **kwargs):
+        """
+        Cluster the roster and build the inverted lists
+        """
+        data = as_encoding_matrix(known_encodings)
+        if n_lists is None:
+            n_lists = max(1, int(4 * np.sqrt(len(data))))
+        n_lists = min(n_lists, len(data))
+
+        centroids, assignments = kmeans(data, n_lists, iterations=iterations)
+        order = np.argsort(assignments, kind='stable')
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=n_lists))))
+
+        return cls(centroids, offsets, data[order], order.astype(np.int64),
+                   np.asarray(known_rolls, dtype=str), **kwargs)
+
+    @classmethod
+    def load(cls, path=INDEX_FILE, **kwargs):
+        with np.load(path) as data:
+            return cls(data['centroids'], data['offsets'], data['encodings'],
+                       data['rows'], data['rolls'], **kwargs)
+
+    def save(self, path=INDEX_FILE):
+        # Write to a temporary file first so readers never see a partial index
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, centroids=self.centroids, offsets=self.offsets,
+                     encodings=self.encodings, rows=self.rows, rolls=self.rolls)
+        os.replace(tmp_path, path)
+
+    def matches_roster(self, known_rolls):
+        """Check the index was built over this exact roster (same rolls, same order)"""
+        return len(self.rolls) == len(known_rolls) and bool(np.all(self.rolls == np.asarray(known_rolls, dtype=str)))
+
+    def add(self, encoding, roll):
+        """
+        Append one student to the end of the roster, placed in its nearest list
+        """
+        vector = as_encoding_matrix(encoding)
+        target = int(np.argmin(_squared_distances(vector, self.centroids)[0]))
+        position = self.offsets[target + 1]
+
+        self.encodings = np.insert(self.encodings, position, vector[0], axis=0)
+        self.rows = np.insert(self.rows, position, len(self.rolls))
+        self.norms = np.insert(self.norms, position, float(vector[0] @ vector[0]))
+        self.offsets[target + 1:] += 1
+        self.rolls = np.append(self.rolls, str(roll))
+
+    def search(self, face_encodings, nprobe=None):
+        """
+        Return (rows, distances) of the approximate nearest roster row for each face
+        """
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        faces = as_encoding_matrix(face_encodings)
+        rows = np.full(len(faces), -1, dtype=np.intp)
+        distances = np.full(len(faces), np.inf, dtype=np.float32)
+
+        if len(faces) == 0 or len(self) == 0:
+            return rows, distances
+
+        probe_lists = np.argpartition(_squared_distances(faces, self.centroids), nprobe - 1, axis=1)[:, :nprobe]
+
+        for i, lists in enumerate(probe_lists):
+            candidates = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists])
+            if len(candidates) == 0:
+                continue
+            squared = _squared_distances(faces[i:i + 1], self.encodings[candidates], self.norms[candidates])[0]
+            best = int(np.argmin(squared))
+            rows[i] = self.rows[candidates[best]]
+            distances[i] = np.sqrt(squared[best])
+
+        return rows, distances
+
+    def match(self, face_encodings):
+        """
+        Same contract as FaceMatcher.match: index is -1 beyond the tolerance
+        """
+        rows, distances = self.search(face_encodings)
+        rows[distances > self.tolerance] = -1
+        return rows, distances
+
+
+def build_index(known_encodings, known_rolls, path=INDEX_FILE):
+    """
+    Build the on-disk index for the given roster and save it
+    """
+    index = IVFIndex.build(known_encodings, known_rolls)
+    index.save(path)
+    return index
+
+
+def update_index(encoding, roll, path=INDEX_FILE):
+    """
+    Add a newly enrolled student to the on-disk index.
+    The index is (re)built from the database once the roster is big enough.
+    """
+    if os.path.exists(path):
+        index = IVFIndex.load(path)
+        index.add(encoding, roll)
+        index.save(path)
+        return index
+
+    from train_faces import load_known_faces
+    known_encodings, _, known_rolls = load_known_faces()
+    if len(known_encodings) >= MIN_INDEX_SIZE:
+        return build_index(known_encodings, known_rolls, path)
+    return None
+
+
+def load_matcher(known_encodings, known_rolls, nprobe=None, tolerance=0.6, path=INDEX_FILE, precision='float32'):
+    """
+    Return an IVFIndex when an up-to-date index exists and nprobe is given,
+    otherwise the exact FaceMatcher, or a QuantizedMatcher when precision is
+    float16 or int8
+    """
+    if nprobe and os.path.exists(path):
+        index = IVFIndex.load(path, tolerance=tolerance, nprobe=nprobe)
+        if index.matches_roster(known_rolls):
+            return index
+        print("ANN index is out of date with the roster, using exact matching.")
+    return make_matcher(known_encodings, tolerance=tolerance, precision=precision)
+
+
+def synthetic_roster(size, dim=128, seed=0):
+    """
+    Random unit-scale encodings standing in for a real roster
+    """
+    rng = np.random.default_rng(seed)
+    return rng.normal(0.0, 0.09, size=(size, dim)).astype(np.float32)
+
+
+def benchmark(known_encodings=None, size=50000, queries=500, nprobes=(1, 2, 4, 8, 16, 32), noise=0.02):
+    """
+    Measure recall@1 and per-face latency of the index against exact search
+    """
+    if known_encodings is None:
+        known_encodings = synthetic_roster(size)
+    data = as_encoding_matrix(known_encodings)
+    rng = np.random.default_rng(1)
+
+    # Queries are roster faces seen again with a little noise
+    targets = rng.choice(len(data), min(queries, len(data)), replace=False)
+    faces = data[targets] + rng.normal(0.0, noise, size=(len(targets), data.shape[1])).astype(np.float32)
+
+    start = time.perf_counter()
+    index = IVFIndex.build(data, np.arange(len(data)).astype(str))
+    print(f"Built index over {len(data)} encodings ({len(index.centroids)} lists) in {time.perf_counter() - start:.2f}s")
+
+    exact = FaceMatcher(data)
+    start = time.perf_counter()
+    exact_rows = np.concatenate([exact.match(faces[i:i + 1])[0] for i in range(len(faces))])
+    exact_ms = (time.perf_counter() - start) * 1000 / len(faces)
+    print(f"exact     : recall 1.000  {exact_ms:.3f} ms/face")
+
+    results = []
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        rows = np.concatenate([index.search(faces[i:i + 1], nprobe)[0] for i in range(len(faces))])
+        latency_ms = (time.perf_counter() - start) * 1000 / len(faces)
+        recall = float(np.mean(rows == exact_rows))
+        results.append((nprobe, recall, latency_ms))
+        print(f"nprobe={nprobe:<3} : recall {recall:.3f}  {latency_ms:.3f} ms/face")
+
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or benchmark the approximate face index")
+    parser.add_argument("command", choices=["build", "benchmark"])
+    parser.add_argument("--size", type=int, default=50000, help="synthetic roster size for benchmark")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--from-db", action="store_true", help="benchmark on the enrolled roster")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from train_faces import load_known_faces
+        known_encodings, _, known_rolls = load_known_faces()
+        build_index(known_encodings, known_rolls)
+        print(f"Index built over {len(known_encodings)} students.")
+    else:
+        encodings = None
+        if args.from_db:
+            from train_faces import load_known_faces
+            encodings = load_known_faces()[0]
+        benchmark(encodings, size=args.size, queries=args.queries)
@@ -0,0 +1,174 @@
+import queue
+import threading
+import time as _time
+from collections import namedtuple
+from datetime import datetime
+from database import AttendanceDatabase
+from metrics import DISABLED
+
+AttendanceEvent = namedtuple('AttendanceEvent', ['student_id', 'date', 'time', 'name', 'roll'])
+
+_STOP = object()
+
+WRITE_RETRIES = 3  # Attempts at a batch before its marks are given up
+RETRY_DELAY = 0.5  # Seconds before the first retry, doubled for each one after
+
+
+def print_result(event, marked):
+    """Default callback, reports each mark like the recognition loops used to"""
+    if marked:
+        print(f"Attendance marked for {event.name} ({event.roll}) at {event.time}")
+    else:
+        print(f"Attendance already marked for {event.name} ({event.roll}) today")
+
+
+class DayState:
+    """
+    Who has been marked on the current day, so "already marked?" is a set
+    lookup rather than a database query.
+
+    The set is bulk-loaded from the database for today when created, and
+    when a mark for a later date arrives the next day's set is loaded and
+    swapped in as one (date, set) pair, so claim() never checks one day's
+    date against another day's students.
+    """
+
+    def __init__(self, db_name='attendance.db', date=None):
+        self.db_name = db_name
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self.day = (None, set())
+        self.load(date or datetime.now().strftime("%Y-%m-%d"))
+
+    @property
+    def date(self):
+        return self.day[0]
+
+    def load(self, date):
+        marked = AttendanceDatabase(self.db_name).get_marked_student_ids(date)
+        with self.lock:
+            self.day = (date, marked)
+
+    def claim(self, student_id, date):
+        """
+        Record student_id as marked on date. Returns False if they already
+        were. Marks for a day before the current one are always let through,
+        the database drops them if they are repeats.
+        """
+        if self.date is None or date > self.date:
+            with self.load_lock:
+                # First mark of a new day, loaded once even if several cameras see it at once
+                if self.date is None or date > self.date:
+                    self.load(date)
+
+        with self.lock:
+            current_date, marked = self.day
+            if date != current_date:
+                return True
+            if student_id in marked:
+                return False
+            marked.add(student_id)
+            return True
+
+    def release(self, student_id, date):
+        """Undo a claim whose mark could not be written, so the next sighting queues it again"""
+        with self.lock:
+            current_date, marked = self.day
+            if date == current_date:
+                marked.discard(student_id)
+
+
+class AttendanceWriter(threading.Thread):
+    """
+    Background thread that takes recognition events from a queue and commits
+    them in batched transactions, so the frame loop never waits on disk.
+
+    A batch is written when it reaches batch_size events or flush_interval
+    seconds after its first event, whichever comes first. close() writes
+    whatever is still queued before returning. A batch that fails to commit
+    (e.g. the database stays locked) is retried with backoff; if it still
+    fails its students are released, so they are queued again when next seen.
+
+    One writer can be shared by several cameras: a student is queued at most
+    once per day however many sources see them. Students already marked
+    today, by this or an earlier run, are known from a DayState loaded at
+    start-up and are never queued.
+    """
+
+    def __init__(self, db_name='attendance.db', batch_size=64, flush_interval=0.5, on_result=print_result,
+                 metrics=DISABLED, retries=WRITE_RETRIES, retry_delay=RETRY_DELAY):
+        super().__init__(name='AttendanceWriter', daemon=True)
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_result = on_result
+        self.metrics = metrics
+        self.retries = max(1, retries)
+        self.retry_delay = retry_delay
+        self.events = queue.Queue()
+        self.day_state = DayState(db_name)
+
+    def mark(self, student_id, date, time, name=None, roll=None):
+        """
+        Queue an attendance mark, returns immediately. Returns False if the
+        student was already marked or queued for that date.
+        """
+        if not self.day_state.claim(student_id, date):
+            return False
+
+        self.events.put(AttendanceEvent(student_id, date, time, name, roll))
+        return True
+
+    def close(self, timeout=None):
+        """Flush pending events and stop the thread"""
+        self.events.put(_STOP)
+        self.join(timeout)
+
+    def run(self):
+        db = AttendanceDatabase(self.db_name)
+        stopping = False
+
+        while not stopping:
+            event = self.events.get()
+            if event is _STOP:
+                break
+
+            batch = [event]
+            deadline = _time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - _time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = self.events.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if event is _STOP:
+                    stopping = True
+                    break
+                batch.append(event)
+
+            with self.metrics.timer('db_write'):
+                self.write(db, batch)
+
+    def write(self, db, batch):
+        marks = [(e.student_id, e.date, e.time) for e in batch]
+        delay = self.retry_delay
+        for attempt in range(1, self.retries + 1):
+            try:
+                results = db.mark_attendance_many(marks)
+                break
+            except Exception as e:
+                if attempt < self.retries:
+                    print(f"Failed to write {len(batch)} attendance marks, retrying in {delay:.1f}s: {e}")
+                    _time.sleep(delay)
+                    delay *= 2
+                    continue
+                print(f"Failed to write {len(batch)} attendance marks: {e}")
+                for event in batch:
+                    self.day_state.release(event.student_id, event.date)
+                return
+
+        if self.on_result:
+            for event, marked in zip(batch, results):
+                self.on_result(event, marked)
@@ -0,0 +1,165 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import cv2
+from face_encoder import DEFAULT_WORKERS
+from face_matcher import FaceMatcher
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+CHUNK_FRAMES = 1500  # Frames of video per job, so one long lecture still uses every core
+IMAGES_PER_JOB = 32
+
+_matcher = None
+_ids = None
+
+
+def _init_worker(encodings, ids, tolerance):
+    global _matcher, _ids
+    _matcher = FaceMatcher(encodings, tolerance=tolerance)
+    _ids = ids
+
+
+def _identify(bgr_frame):
+    """Student ids of the known faces in a frame"""
+    import face_recognition
+
+    rgb_frame = cv2.cvtColor(bgr_frame, cv2.COLOR_BGR2RGB)
+    locations = face_recognition.face_locations(rgb_frame)
+    if not locations:
+        return []
+
+    indices, _ = _matcher.match(face_recognition.face_encodings(rgb_frame, locations))
+    return [_ids[i] for i in indices if i >= 0]
+
+
+def _process_video_chunk(job):
+    """Worker: sightings (student_id, timestamp) in frames [start, stop) of a video"""
+    path, start, stop, every, started_at, fps = job
+    cap = cv2.VideoCapture(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    sightings = []
+    for position in range(start, stop):
+        if (position - start) % every:
+            # grab() skips the frame without converting it
+            if not cap.grab():
+                break
+            continue
+
+        ret, frame = cap.read()
+        if not ret:
+            break
+        timestamp = started_at + position / fps
+        sightings.extend((student_id, timestamp) for student_id in _identify(frame))
+
+    cap.release()
+    return sightings
+
+
+def _process_images(paths):
+    """Worker: sightings (student_id, timestamp) in a list of image files"""
+    sightings = []
+    for path in paths:
+        frame = cv2.imread(path)
+        if frame is None:
+            print(f"Could not read {path}")
+            continue
+        timestamp = os.path.getmtime(path)
+        sightings.extend((student_id, timestamp) for student_id in _identify(frame))
+    return sightings
+
+
+def video_jobs(path, every):
+    """
+    Split a video into frame ranges. Timestamps are derived from the file:
+    the recording is taken to end at the file's modification time.
+    """
+    cap = cv2.VideoCapture(path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+
+    if frame_count <= 0:
+        print(f"Could not read {path}")
+        return []
+
+    started_at = os.path.getmtime(path) - frame_count / fps
+    # Chunk boundaries fall on sampled frames so sampling stays every k-th frame overall
+    chunk = max(every, CHUNK_FRAMES - CHUNK_FRAMES % every)
+    return [(path, start, min(start + chunk, frame_count), every, started_at, fps)
+            for start in range(0, frame_count, chunk)]
+
+
+def collect_sightings(first_seen, sightings):
+    """Keep the earliest sighting of each student on each day in first_seen[(student_id, date)]"""
+    for student_id, timestamp in sightings:
+        key = (student_id, datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d"))
+        if timestamp < first_seen.get(key, float('inf')):
+            first_seen[key] = timestamp
+
+
+def first_sighting_marks(first_seen):
+    """(student_id, date, time) marks in the order the students were seen, one per student per day"""
+    marks = []
+    for (student_id, date), timestamp in sorted(first_seen.items(), key=lambda item: item[1]):
+        marks.append((student_id, date, datetime.fromtimestamp(timestamp).strftime("%H:%M:%S")))
+    return marks
+
+
+def collect_inputs(paths):
+    """Split the given files and directories into video files and image files"""
+    videos, images = [], []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    images.append(os.path.join(path, name))
+        elif path.lower().endswith(IMAGE_EXTENSIONS):
+            images.append(path)
+        else:
+            videos.append(path)
+    return videos, images
+
+
+def run_batch(paths, roster, db, every=1, workers=DEFAULT_WORKERS, tolerance=0.6):
+    """
+    Headless attendance from recorded videos and image folders.
+
+    Every k-th frame is decoded and recognized, spread across `workers`
+    processes. Each student is marked once per day they appear in, with
+    the time they were first seen that day, taken from the file rather than
+    the clock. Returns the marks written.
+    """
+    every = max(1, every)
+    videos, images = collect_inputs(paths)
+
+    jobs = []
+    for path in videos:
+        jobs.extend((_process_video_chunk, job) for job in video_jobs(path, every))
+    for i in range(0, len(images), IMAGES_PER_JOB):
+        jobs.append((_process_images, images[i:i + IMAGES_PER_JOB]))
+
+    print(f"Processing {len(videos)} video(s) and {len(images)} image(s) in {len(jobs)} job(s).")
+
+    initargs = (roster.encodings, list(roster.ids), tolerance)
+    first_seen = {}
+
+    if workers <= 1:
+        _init_worker(*initargs)
+        for func, job in jobs:
+            collect_sightings(first_seen, func(job))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            futures = [pool.submit(func, job) for func, job in jobs]
+            for done, future in enumerate(futures, 1):
+                collect_sightings(first_seen, future.result())
+                print(f"Finished {done}/{len(jobs)} jobs")
+
+    marks = first_sighting_marks(first_seen)
+    results = db.mark_attendance_many(marks)
+    names = dict(zip(roster.ids, roster.names))
+    for (student_id, date, time), marked in zip(marks, results):
+        status = "marked" if marked else "already marked"
+        print(f"{names.get(student_id, student_id)}: {status} for {date} at {time}")
+
+    return marks
@@ -0,0 +1,237 @@
+"""
+Benchmarks for the attendance system that need no camera.
+
+Builds synthetic rosters (random 128-d encodings), synthetic face crops for
+the LBPH path, synthetic frames for the tracker and generated attendance
+histories in a temporary database, times the hot paths and prints the
+results as JSON so runs from different versions can be compared:
+
+    python benchmarks.py --sizes 100 1000 10000 --output before.json
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import random
+import platform
+import tempfile
+import subprocess
+from datetime import date, timedelta
+import numpy as np
+from database import AttendanceDatabase
+from face_matcher import FaceMatcher, make_matcher
+from roster_file import load_roster, refresh_roster, roster_path
+
+MAX_HISTORY_ROWS = 2000000
+
+
+def timed(func, repeat=1):
+    """Best wall time of func() in milliseconds over `repeat` runs, and its last result"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best, result
+
+
+def synthetic_encodings(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(0.0, 0.09, size=(count, 128))
+
+
+def populate_students(db, encodings):
+    """Insert a synthetic roster in one transaction"""
+    conn = db.connect()
+    with conn:
+        conn.executemany(
+            'INSERT INTO students (name, roll_number, face_encoding) VALUES (?, ?, ?)',
+            ((f'Student {i}', f'R{i:06d}', pickle.dumps(encoding)) for i, encoding in enumerate(encodings)))
+
+
+def populate_history(db, student_count, days, rate=0.85, seed=0):
+    """Generate `days` days of attendance, each student present with probability `rate`"""
+    rng = random.Random(seed)
+    first_day = date.today() - timedelta(days=days)
+    conn = db.connect()
+    with conn:
+        for day in range(days):
+            day_text = (first_day + timedelta(days=day)).isoformat()
+            conn.executemany(
+                'INSERT OR IGNORE INTO attendance (student_id, date, time) VALUES (?, ?, ?)',
+                ((student_id, day_text, '09:00:00') for student_id in range(1, student_count + 1)
+                 if rng.random() < rate))
+    return first_day
+
+
+def bench_roster(size, workdir, history_days, queries=200):
+    """Roster load, matching, attendance writes and reports for one roster size"""
+    db = AttendanceDatabase(os.path.join(workdir, f'bench_{size}.db'))
+    encodings = synthetic_encodings(size)
+    populate_students(db, encodings)
+    results = {'roster': size}
+
+    # Roster load: rebuilt from SQLite, then mapped from the roster file
+    if os.path.exists(roster_path(db.db_name)):
+        os.remove(roster_path(db.db_name))
+    results['roster_rebuild_ms'], _ = timed(lambda: refresh_roster(db))
+    results['roster_mmap_load_ms'], roster = timed(lambda: load_roster(db), repeat=5)
+
+    # Per-face matching against the whole roster
+    matcher = FaceMatcher(roster.encodings)
+    rng = np.random.default_rng(1)
+    truth = rng.choice(size, queries)
+    faces = encodings[truth] + rng.normal(0.0, 0.02, size=(queries, 128))
+    single_ms, _ = timed(lambda: [matcher.match(faces[i:i + 1]) for i in range(queries)], repeat=3)
+    frame_ms, _ = timed(lambda: matcher.match(faces[:10]), repeat=10)
+    results['match_per_face_ms'] = single_ms / queries
+    results['match_10_faces_ms'] = frame_ms
+
+    # Compact rosters: footprint, latency and accuracy against the exact matcher
+    exact_indices, _ = matcher.match(faces)
+    results['float32_bytes'] = matcher.encodings.nbytes
+    results['match_accuracy'] = float(np.mean(exact_indices == truth))
+    sample = min(queries, 50)
+    for precision in ('float16', 'int8'):
+        build_ms, quantized = timed(lambda: make_matcher(roster.encodings, precision=precision))
+        single_ms, _ = timed(lambda: [quantized.match(faces[i:i + 1]) for i in range(sample)])
+        indices, _ = quantized.match(faces)
+        results[precision] = {
+            'bytes': quantized.nbytes,
+            'build_ms': build_ms,
+            'match_per_face_ms': single_ms / sample,
+            'agreement_with_exact': float(np.mean(indices == exact_indices)),
+            'match_accuracy': float(np.mean(indices == truth)),
+        }
+
+    # Attendance writes
+    today = date.today().isoformat()
+    marks = min(size, 1000)
+    elapsed, _ = timed(lambda: [db.mark_attendance(i, today, '10:00:00') for i in range(1, marks + 1)])
+    results['mark_attendance_per_sec'] = marks / (elapsed / 1000)
+
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+    elapsed, _ = timed(lambda: db.mark_attendance_many([(i, tomorrow, '10:00:00') for i in range(1, marks + 1)]))
+    results['mark_attendance_many_per_sec'] = marks / (elapsed / 1000)
+
+    # Reports over a generated history
+    days = max(1, min(history_days, MAX_HISTORY_ROWS // size))
+    first_day = populate_history(db, size, days)
+    results['history_days'] = days
+    results['report_overall_ms'], _ = timed(lambda: db.get_attendance_report(), repeat=3)
+    results['report_daily_ms'], _ = timed(lambda: db.get_attendance_report(first_day.isoformat()), repeat=3)
+    results['report_percent_ms'], _ = timed(lambda: db.get_attendance_percentages(), repeat=3)
+    week_end = (first_day + timedelta(days=6)).isoformat()
+    results['report_week_ms'], _ = timed(lambda: db.get_attendance_percentages(first_day.isoformat(), week_end), repeat=3)
+
+    return results
+
+
+def bench_lbph(students, workdir, faces_per_student=20, queries=20):
+    """LBPH predict latency for SimpleFaceRecognition's histogram store"""
+    from lbph_store import LBPHStore
+
+    store = LBPHStore(os.path.join(workdir, f'lbph_{students}'))
+    rng = np.random.default_rng(2)
+    for student_id in range(1, students + 1):
+        store.add(student_id, [rng.integers(0, 256, (100, 100), dtype=np.uint8) for _ in range(faces_per_student)])
+
+    load_ms, _ = timed(lambda: LBPHStore(os.path.join(workdir, f'lbph_{students}')).load(), repeat=3)
+    crops = [rng.integers(0, 256, (100, 100), dtype=np.uint8) for _ in range(queries)]
+    elapsed, _ = timed(lambda: [store.predict(crop) for crop in crops])
+
+    return {'students': students, 'histograms': len(store), 'load_ms': load_ms,
+            'predict_per_face_ms': elapsed / queries}
+
+
+def synthetic_frames(count, width=640, height=480, faces=3, seed=3):
+    """Frames of noise with textured patches drifting across them, plus each patch's box"""
+    rng = np.random.default_rng(seed)
+    background = rng.integers(0, 256, (height, width), dtype=np.uint8)
+    patches = [rng.integers(0, 256, (120, 100), dtype=np.uint8) for _ in range(faces)]
+    for index in range(count):
+        frame = background.copy()
+        boxes = []
+        for i, patch in enumerate(patches):
+            top, left = 60 + 100 * i, 40 + (index * 3 + 150 * i) % (width - 140)
+            frame[top:top + 120, left:left + 100] = patch
+            boxes.append((top, left + 100, top + 120, left))
+        yield frame, boxes
+
+
+def bench_frames(count=300, detect_every=5):
+    """Per-frame cost of the tracker between detections, and of face detection when installed"""
+    from tracking import FaceTracker
+
+    frames = list(synthetic_frames(count))
+    tracker = FaceTracker(detect_every=detect_every)
+    elapsed, _ = timed(lambda: [tracker.update(gray, lambda: boxes) for gray, boxes in frames])
+    results = {'frames': count, 'detect_every': detect_every,
+               'track_per_frame_ms': elapsed / count, 'detections': tracker.detections}
+
+    try:
+        import face_recognition
+    except ImportError:
+        return results
+
+    rgb_frames = [np.dstack([gray] * 3) for gray, _ in frames[:20]]
+    elapsed, _ = timed(lambda: [face_recognition.face_locations(rgb) for rgb in rgb_frames])
+    results['detect_per_frame_ms'] = elapsed / len(rgb_frames)
+    return results
+
+
+def git_version():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, lbph_sizes, history_days):
+    report = {
+        'version': git_version(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'roster': [],
+        'lbph': [],
+        'frames': bench_frames(),
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            print(f"Roster of {size} students...", file=sys.stderr)
+            report['roster'].append(bench_roster(size, workdir, history_days))
+
+        for students in lbph_sizes:
+            print(f"LBPH store with {students} students...", file=sys.stderr)
+            try:
+                report['lbph'].append(bench_lbph(students, workdir))
+            except AttributeError:
+                print("cv2.face is not available (install opencv-contrib-python), skipping LBPH.", file=sys.stderr)
+                break
+
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the attendance system without a camera")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--lbph-sizes", type=int, nargs="*", default=[10, 100])
+    parser.add_argument("--history-days", type=int, default=120)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.lbph_sizes, args.history_days)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
@@ -0,0 +1,162 @@
+import os
+import csv
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+from database import AttendanceDatabase
+from ann_index import INDEX_FILE, MIN_INDEX_SIZE, build_index
+from face_encoder import DEFAULT_WORKERS
+
+BATCH_SIZE = 256  # Students encoded and committed together
+MAX_PHOTO_SIDE = 800  # ID scans are downscaled to this before detection
+FAILURE_REPORT = 'enroll_failures.csv'
+
+NAME_COLUMNS = ('name',)
+ROLL_COLUMNS = ('roll_number', 'roll')
+PHOTO_COLUMNS = ('photo', 'image', 'file')
+
+
+def _column(row, names):
+    for name in names:
+        if row.get(name):
+            return row[name].strip()
+    return ''
+
+
+def read_students(csv_path, photo_dir):
+    """Rows of (line, name, roll_number, photo path) from the enrollment CSV"""
+    students = []
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        reader.fieldnames = [field.strip().lower() for field in reader.fieldnames or []]
+        for line, row in enumerate(reader, 2):
+            photo = _column(row, PHOTO_COLUMNS)
+            students.append((line, _column(row, NAME_COLUMNS), _column(row, ROLL_COLUMNS),
+                             os.path.join(photo_dir, photo) if photo else ''))
+    return students
+
+
+def _encode_photo(path):
+    """Worker: (encoding, None) for the single face in a photo, or (None, reason)"""
+    try:
+        return _encode_single_face(path)
+    except Exception as e:
+        # A corrupt or odd photo fails its own row, not the whole run
+        return None, str(e) or type(e).__name__
+
+
+def _encode_single_face(path):
+    import face_recognition
+
+    image = cv2.imread(path)
+    if image is None:
+        return None, 'could not read photo'
+
+    scale = MAX_PHOTO_SIDE / max(image.shape[:2])
+    if scale < 1:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    locations = face_recognition.face_locations(rgb)
+    if not locations:
+        return None, 'no face found'
+    if len(locations) > 1:
+        return None, f'{len(locations)} faces found'
+
+    return face_recognition.face_encodings(rgb, locations)[0], None
+
+
+def bulk_enroll(csv_path, photo_dir, workers=DEFAULT_WORKERS, report_path=FAILURE_REPORT, db=None):
+    """
+    Enroll every student in a CSV (name, roll_number, photo) from their ID photo.
+
+    Photos are encoded across `workers` processes and students are committed
+    BATCH_SIZE at a time. Roll numbers already in the database are skipped,
+    so an interrupted run picks up where it stopped when started again.
+    Rows that could not be enrolled are written to report_path with the
+    reason. Returns (enrolled, skipped, failed) counts.
+    """
+    db = db or AttendanceDatabase()
+    enrolled_rolls = {roll for _, _, roll in db.get_all_students()}
+
+    pending, failures = [], []
+    skipped = 0
+    seen = set()
+    for line, name, roll, photo in read_students(csv_path, photo_dir):
+        if not (name and roll and photo):
+            failures.append((line, name, roll, photo, 'missing name, roll number or photo'))
+        elif roll in enrolled_rolls:
+            skipped += 1
+        elif roll in seen:
+            failures.append((line, name, roll, photo, 'duplicate roll number in CSV'))
+        else:
+            seen.add(roll)
+            pending.append((line, name, roll, photo))
+
+    print(f"{len(pending)} student(s) to enroll, {skipped} already enrolled.")
+
+    enrolled = 0
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for start in range(0, len(pending), BATCH_SIZE):
+            batch = pending[start:start + BATCH_SIZE]
+            paths = [photo for _, _, _, photo in batch]
+            if pool is None:
+                results = [_encode_photo(path) for path in paths]
+            else:
+                results = list(pool.map(_encode_photo, paths, chunksize=max(1, len(paths) // (workers * 4))))
+
+            students, rows = [], []
+            for (line, name, roll, photo), (encoding, error) in zip(batch, results):
+                if encoding is None:
+                    failures.append((line, name, roll, photo, error))
+                else:
+                    students.append((name, roll, pickle.dumps(encoding)))
+                    rows.append((line, name, roll, photo))
+
+            for (line, name, roll, photo), student_id in zip(rows, db.add_students_many(students)):
+                if student_id is None:
+                    failures.append((line, name, roll, photo, 'roll number already exists'))
+                else:
+                    enrolled += 1
+
+            print(f"Processed {start + len(batch)}/{len(pending)}: {enrolled} enrolled, {len(failures)} failed")
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        write_failures(report_path, failures)
+
+    if enrolled:
+        # One rebuild of the roster file and the approximate index for the whole run
+        roster = db.refresh_roster()
+        if os.path.exists(INDEX_FILE) or len(roster.encodings) >= MIN_INDEX_SIZE:
+            build_index(roster.encodings, roster.rolls)
+
+    return enrolled, skipped, len(failures)
+
+
+def write_failures(path, failures):
+    if not failures:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['line', 'name', 'roll_number', 'photo', 'reason'])
+        writer.writerows(sorted(failures))
+    print(f"{len(failures)} row(s) could not be enrolled, see {path}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Enroll students in bulk from ID photos")
+    parser.add_argument("csv", help="CSV with name, roll_number and photo columns")
+    parser.add_argument("photo_dir", nargs="?", default=".", help="directory the photo column is relative to")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="face encoding processes (1 = in-process)")
+    parser.add_argument("--report", default=FAILURE_REPORT, help="where to write the rows that failed")
+    args = parser.parse_args()
+
+    enrolled, skipped, failed = bulk_enroll(args.csv, args.photo_dir, workers=args.workers, report_path=args.report)
+    print(f"Enrolled {enrolled}, skipped {skipped} already enrolled, {failed} failed.")
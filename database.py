@@ -1,77 +1,390 @@
 import sqlite3
 import os
+import threading
+
+class ConnectionManager:
+    """
+    One long-lived SQLite connection per thread for a database file.
+
+    Connections run in WAL mode so readers (reports, student lists) never
+    block the recognition writer, with synchronous=NORMAL to avoid an fsync
+    per commit, and keep a prepared statement cache across calls.
+    """
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.local = threading.local()
+
+    def get(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = open_connection(self.db_name)
+        return conn
+
+    def close(self):
+        """Close the calling thread's connection"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+
+def open_connection(db_name, **kwargs):
+    """Open a connection with the pragmas every connection should use"""
+    conn = sqlite3.connect(db_name, timeout=30, cached_statements=256, **kwargs)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute('PRAGMA cache_size = -16000')  # 16 MB page cache
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_connection(db_name='attendance.db'):
+    """The calling thread's connection to db_name, shared by every user in the process"""
+    path = os.path.abspath(db_name)
+    with _managers_lock:
+        manager = _managers.get(path)
+        if manager is None:
+            manager = _managers[path] = ConnectionManager(db_name)
+    return manager.get()
+
+
+def _create_base_tables(cursor):
+    # Create students table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            roll_number TEXT UNIQUE NOT NULL,
+            face_encoding BLOB
+        )
+    ''')
+
+    # Create attendance table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER,
+            date TEXT,
+            time TEXT,
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    ''')
+
+    # Roster version, bumped on every change to the students table so the
+    # memory-mapped roster file can tell when it is stale
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS roster_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO roster_meta (id, version) VALUES (0, 0)')
+
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS students_roster_{event.lower()}
+            AFTER {event} ON students
+            BEGIN
+                UPDATE roster_meta SET version = version + 1;
+            END
+        ''')
+
+
+def _add_face_encoding_column(cursor):
+    # Databases created by SimpleFaceRecognition have no face_encoding column
+    cursor.execute('PRAGMA table_info(students)')
+    if 'face_encoding' not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE students ADD COLUMN face_encoding BLOB')
+
+
+def _unique_attendance_per_day(cursor):
+    # Keep the earliest mark when a student was marked twice on one day
+    cursor.execute('''
+        DELETE FROM attendance
+        WHERE id NOT IN (SELECT MIN(id) FROM attendance GROUP BY student_id, date)
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_student_date
+        ON attendance (student_id, date)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance (date)')
+
+
+def _attendance_summaries(cursor):
+    # Running totals kept by triggers, so reports never scan the history:
+    # students present per day, and days present per student
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_attendance (
+            date TEXT PRIMARY KEY,
+            present INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS student_attendance (
+            student_id INTEGER PRIMARY KEY,
+            days_present INTEGER NOT NULL
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS attendance_summary_insert
+        AFTER INSERT ON attendance
+        BEGIN
+            INSERT INTO daily_attendance (date, present) VALUES (NEW.date, 1)
+            ON CONFLICT (date) DO UPDATE SET present = present + 1;
+            INSERT INTO student_attendance (student_id, days_present) VALUES (NEW.student_id, 1)
+            ON CONFLICT (student_id) DO UPDATE SET days_present = days_present + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS attendance_summary_delete
+        AFTER DELETE ON attendance
+        BEGIN
+            UPDATE daily_attendance SET present = present - 1 WHERE date = OLD.date;
+            UPDATE student_attendance SET days_present = days_present - 1 WHERE student_id = OLD.student_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS attendance_summary_update
+        AFTER UPDATE OF student_id, date ON attendance
+        BEGIN
+            UPDATE daily_attendance SET present = present - 1 WHERE date = OLD.date;
+            UPDATE student_attendance SET days_present = days_present - 1 WHERE student_id = OLD.student_id;
+            INSERT INTO daily_attendance (date, present) VALUES (NEW.date, 1)
+            ON CONFLICT (date) DO UPDATE SET present = present + 1;
+            INSERT INTO student_attendance (student_id, days_present) VALUES (NEW.student_id, 1)
+            ON CONFLICT (student_id) DO UPDATE SET days_present = days_present + 1;
+        END
+    ''')
+
+    # Backfill from the existing history
+    cursor.execute('DELETE FROM daily_attendance')
+    cursor.execute('DELETE FROM student_attendance')
+    cursor.execute('''
+        INSERT INTO daily_attendance (date, present)
+        SELECT date, COUNT(*) FROM attendance GROUP BY date
+    ''')
+    cursor.execute('''
+        INSERT INTO student_attendance (student_id, days_present)
+        SELECT student_id, COUNT(*) FROM attendance GROUP BY student_id
+    ''')
+
+    # Date range reports read (date, student_id) straight from this index
+    # without touching the table
+    cursor.execute('DROP INDEX IF EXISTS idx_attendance_date')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_date_student ON attendance (date, student_id)')
+
+
+# Schema versions, tracked in PRAGMA user_version. Append new migrations
+# with the next number; never edit one that has shipped.
+MIGRATIONS = [
+    (1, 'create students, attendance and roster tables', _create_base_tables),
+    (2, 'add students.face_encoding', _add_face_encoding_column),
+    (3, 'unique (student_id, date) attendance index', _unique_attendance_per_day),
+    (4, 'daily and per-student attendance summaries', _attendance_summaries),
+]
+
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Bring the database schema up to the latest version, one transaction per
+    migration. Safe to call from several processes at once.
+    """
+    for version, description, apply in MIGRATIONS:
+        if get_schema_version(conn) >= version:
+            continue
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Another process may have applied it while we waited for the lock
+            if get_schema_version(conn) < version:
+                apply(conn.cursor())
+                conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    return get_schema_version(conn)
+
+
+# Rows fetched from SQLite at a time by the streaming report queries
+REPORT_CHUNK_SIZE = 500
+
+
+def iter_rows(cursor, chunk_size=REPORT_CHUNK_SIZE):
+    """Yield a cursor's rows, fetching chunk_size at a time so memory stays flat"""
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield from rows
+
+
+# Students shown per page in the GUIs
+STUDENT_PAGE_SIZE = 100
+
+
+def _student_filter(search=None, present_on=None, absent_on=None):
+    """WHERE clause and parameters for a name/roll search and a present or absent on date filter"""
+    clauses, params = [], []
+    if search:
+        clauses.append("(s.name LIKE ? ESCAPE '\\' OR s.roll_number LIKE ? ESCAPE '\\')")
+        pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        params += [pattern, pattern]
+    if present_on:
+        clauses.append('EXISTS (SELECT 1 FROM attendance a WHERE a.student_id = s.id AND a.date = ?)')
+        params.append(present_on)
+    if absent_on:
+        clauses.append('NOT EXISTS (SELECT 1 FROM attendance a WHERE a.student_id = s.id AND a.date = ?)')
+        params.append(absent_on)
+    return ('WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+def search_students(conn, search=None, present_on=None, absent_on=None, offset=0, limit=STUDENT_PAGE_SIZE):
+    """One page of (id, name, roll_number), ordered by name, filtered in SQL"""
+    where, params = _student_filter(search, present_on, absent_on)
+    cursor = conn.execute(f'''
+        SELECT s.id, s.name, s.roll_number
+        FROM students s
+        {where}
+        ORDER BY s.name, s.id
+        LIMIT ? OFFSET ?
+    ''', params + [limit, offset])
+    return cursor.fetchall()
+
+
+def count_students(conn, search=None, present_on=None, absent_on=None):
+    where, params = _student_filter(search, present_on, absent_on)
+    return conn.execute(f'SELECT COUNT(*) FROM students s {where}', params).fetchone()[0]
+
+
+MARK_ATTENDANCE_SQL = '''
+    INSERT INTO attendance (student_id, date, time)
+    VALUES (?, ?, ?)
+    ON CONFLICT (student_id, date) DO NOTHING
+'''
+
 
 class AttendanceDatabase:
     def __init__(self, db_name='attendance.db'):
         self.db_name = db_name
         self.create_tables()
 
-    def create_tables(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+    def connect(self):
+        return get_connection(self.db_name)
 
-        # Create students table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS students (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                roll_number TEXT UNIQUE NOT NULL,
-                face_encoding BLOB
-            )
-        ''')
+    def create_tables(self):
+        # Creates the tables on a new database and upgrades older files in place
+        migrate(self.connect())
 
-        # Create attendance table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS attendance (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                student_id INTEGER,
-                date TEXT,
-                time TEXT,
-                FOREIGN KEY (student_id) REFERENCES students (id)
-            )
-        ''')
+    def get_roster_version(self):
+        cursor = self.connect().execute('SELECT version FROM roster_meta WHERE id = 0')
+        row = cursor.fetchone()
+        return row[0] if row else 0
 
-        conn.commit()
-        conn.close()
+    def refresh_roster(self):
+        """
+        Rewrite the memory-mapped roster file from the students table. Writes
+        only bump the roster version; readers rebuild a stale file on load,
+        so a bulk import pays for one rebuild instead of one per batch.
+        """
+        import roster_file
+        return roster_file.refresh_roster(self)
 
     def add_student(self, name, roll_number, face_encoding=None):
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
 
         try:
-            cursor.execute('''
-                INSERT INTO students (name, roll_number, face_encoding)
-                VALUES (?, ?, ?)
-            ''', (name, roll_number, face_encoding))
-            conn.commit()
-            return cursor.lastrowid
+            with conn:
+                cursor.execute('''
+                    INSERT INTO students (name, roll_number, face_encoding)
+                    VALUES (?, ?, ?)
+                ''', (name, roll_number, face_encoding))
+            student_id = cursor.lastrowid
         except sqlite3.IntegrityError:
             return None  # Roll number already exists
-        finally:
-            conn.close()
+
+        return student_id
+
+    def add_students_many(self, students):
+        """
+        Insert several (name, roll_number, face_encoding) tuples in one
+        transaction. Returns the new student id of each, or None where the
+        roll number already exists.
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+        student_ids = []
+
+        with conn:
+            for student in students:
+                cursor.execute('''
+                    INSERT INTO students (name, roll_number, face_encoding)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT (roll_number) DO NOTHING
+                ''', student)
+                student_ids.append(cursor.lastrowid if cursor.rowcount == 1 else None)
+
+        return student_ids
 
     def get_all_students(self):
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
 
         cursor.execute('SELECT id, name, roll_number FROM students')
         students = cursor.fetchall()
 
-        conn.close()
         return students
 
+    def search_students(self, search=None, present_on=None, absent_on=None, offset=0, limit=STUDENT_PAGE_SIZE):
+        return search_students(self.connect(), search, present_on, absent_on, offset, limit)
+
+    def count_students(self, search=None, present_on=None, absent_on=None):
+        return count_students(self.connect(), search, present_on, absent_on)
+
+    def iter_face_encodings(self):
+        """
+        Stream (id, name, roll_number, face_encoding) for every enrolled
+        student with one query, ordered by id
+        """
+        cursor = self.connect().execute('''
+            SELECT id, name, roll_number, face_encoding
+            FROM students
+            WHERE face_encoding IS NOT NULL
+            ORDER BY id
+        ''')
+        for row in cursor:
+            yield row
+
+    def get_data_version(self, conn):
+        """
+        Change counter of the database as seen by conn: PRAGMA data_version
+        moves on commits from other connections, total_changes on its own
+        """
+        return conn.execute('PRAGMA data_version').fetchone()[0], conn.total_changes
+
     def get_student_by_roll(self, roll_number):
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
 
         cursor.execute('SELECT id, name, roll_number, face_encoding FROM students WHERE roll_number = ?', (roll_number,))
         student = cursor.fetchone()
 
-        conn.close()
         return student
 
     def update_face_encoding(self, roll_number, face_encoding):
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
 
         cursor.execute('''
@@ -81,33 +394,44 @@ class AttendanceDatabase:
         ''', (face_encoding, roll_number))
 
         conn.commit()
-        conn.close()
+
+    def get_marked_student_ids(self, date):
+        """Ids of the students marked on a date, read from the (date, student_id) index"""
+        cursor = self.connect().execute('SELECT student_id FROM attendance WHERE date = ?', (date,))
+        return {student_id for student_id, in iter_rows(cursor)}
 
     def mark_attendance(self, student_id, date, time):
-        conn = sqlite3.connect(self.db_name)
+        conn = self.connect()
         cursor = conn.cursor()
 
-        # Check if attendance already marked for today
-        cursor.execute('''
-            SELECT id FROM attendance
-            WHERE student_id = ? AND date = ?
-        ''', (student_id, date))
+        # The unique (student_id, date) index makes a repeat mark a no-op
+        with conn:
+            cursor.execute(MARK_ATTENDANCE_SQL, (student_id, date, time))
 
-        if cursor.fetchone() is None:
-            cursor.execute('''
-                INSERT INTO attendance (student_id, date, time)
-                VALUES (?, ?, ?)
-            ''', (student_id, date, time))
-            conn.commit()
-            marked = True
-        else:
-            marked = False
+        return cursor.rowcount == 1
 
-        conn.close()
-        return marked
+    def mark_attendance_many(self, marks):
+        """
+        Mark attendance for several (student_id, date, time) tuples in one
+        transaction, returns a list telling which of them were newly marked
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+        results = []
 
-    def get_attendance_report(self, date=None):
-        conn = sqlite3.connect(self.db_name)
+        with conn:
+            for mark in marks:
+                cursor.execute(MARK_ATTENDANCE_SQL, mark)
+                results.append(cursor.rowcount == 1)
+
+        return results
+
+    def iter_attendance_report(self, date=None, chunk_size=REPORT_CHUNK_SIZE):
+        """
+        Stream the report for a date, (name, roll_number, date, time) with
+        time None when absent, or overall, (name, roll_number, total_days)
+        """
+        conn = self.connect()
         cursor = conn.cursor()
 
         if date:
@@ -118,14 +442,80 @@ class AttendanceDatabase:
                 ORDER BY s.name
             ''', (date,))
         else:
+            # Totals come from the summary table, not the attendance history
             cursor.execute('''
-                SELECT s.name, s.roll_number, COUNT(a.id) as total_days
+                SELECT s.name, s.roll_number, COALESCE(sa.days_present, 0) as total_days
+                FROM students s
+                LEFT JOIN student_attendance sa ON s.id = sa.student_id
+                ORDER BY s.name
+            ''')
+
+        return iter_rows(cursor, chunk_size)
+
+    def get_attendance_report(self, date=None):
+        return list(self.iter_attendance_report(date))
+
+    def iter_attendance_log(self, start_date=None, end_date=None, chunk_size=REPORT_CHUNK_SIZE):
+        """Stream every mark, (date, time, name, roll_number), in date order, optionally between two dates"""
+        cursor = self.connect().execute('''
+            SELECT a.date, a.time, s.name, s.roll_number
+            FROM attendance a
+            JOIN students s ON s.id = a.student_id
+            WHERE a.date >= COALESCE(?, '') AND a.date <= COALESCE(?, '9999-12-31')
+            ORDER BY a.date, a.time
+        ''', (start_date, end_date))
+        return iter_rows(cursor, chunk_size)
+
+    def get_class_days(self, start_date=None, end_date=None):
+        """Number of days anyone was marked present, optionally between two dates (inclusive)"""
+        cursor = self.connect().execute('''
+            SELECT COUNT(*) FROM daily_attendance
+            WHERE present > 0 AND date >= COALESCE(?, '') AND date <= COALESCE(?, '9999-12-31')
+        ''', (start_date, end_date))
+        return cursor.fetchone()[0]
+
+    def get_daily_totals(self, start_date=None, end_date=None):
+        """(date, students present) for every class day, optionally between two dates"""
+        cursor = self.connect().execute('''
+            SELECT date, present FROM daily_attendance
+            WHERE present > 0 AND date >= COALESCE(?, '') AND date <= COALESCE(?, '9999-12-31')
+            ORDER BY date
+        ''', (start_date, end_date))
+        return cursor.fetchall()
+
+    def iter_attendance_percentages(self, start_date=None, end_date=None, chunk_size=REPORT_CHUNK_SIZE):
+        """
+        Stream (name, roll_number, days present, class days, percentage) per
+        student, overall or between two dates (inclusive).
+
+        Overall figures come from the summary tables; a date range counts
+        marks in the range from the (date, student_id) index alone.
+        """
+        conn = self.connect()
+        class_days = self.get_class_days(start_date, end_date)
+
+        if start_date is None and end_date is None:
+            cursor = conn.execute('''
+                SELECT s.name, s.roll_number, COALESCE(sa.days_present, 0)
                 FROM students s
-                LEFT JOIN attendance a ON s.id = a.student_id
-                GROUP BY s.id
+                LEFT JOIN student_attendance sa ON s.id = sa.student_id
                 ORDER BY s.name
             ''')
+        else:
+            cursor = conn.execute('''
+                SELECT s.name, s.roll_number, COALESCE(r.days_present, 0)
+                FROM students s
+                LEFT JOIN (
+                    SELECT student_id, COUNT(*) as days_present
+                    FROM attendance
+                    WHERE date >= COALESCE(?, '') AND date <= COALESCE(?, '9999-12-31')
+                    GROUP BY student_id
+                ) r ON s.id = r.student_id
+                ORDER BY s.name
+            ''', (start_date, end_date))
+
+        for name, roll, days in iter_rows(cursor, chunk_size):
+            yield name, roll, days, class_days, 100.0 * days / class_days if class_days else 0.0
 
-        report = cursor.fetchall()
-        conn.close()
-        return report
+    def get_attendance_percentages(self, start_date=None, end_date=None):
+        return list(self.iter_attendance_percentages(start_date, end_date))
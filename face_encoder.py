@@ -0,0 +1,96 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+
+# Context kept around each face so dlib's landmark and alignment steps see
+# the same pixels as they would in the full frame
+CROP_MARGIN = 0.5
+
+
+def _init_worker():
+    # Importing face_recognition loads the dlib detector, landmark and
+    # encoding models once per worker process
+    import face_recognition  # noqa: F401
+
+
+def _encode_crops(crops):
+    """Worker: encodings for a list of (crop, location within crop)"""
+    import face_recognition
+    return [face_recognition.face_encodings(crop, [location])[0] for crop, location in crops]
+
+
+def crop_face(image, location, margin=CROP_MARGIN):
+    """
+    Cut a face out of an image with some context around it, returns the crop
+    and the face location relative to the crop
+    """
+    top, right, bottom, left = location
+    pad_y = int((bottom - top) * margin)
+    pad_x = int((right - left) * margin)
+
+    y0, x0 = max(0, top - pad_y), max(0, left - pad_x)
+    y1, x1 = min(image.shape[0], bottom + pad_y), min(image.shape[1], right + pad_x)
+
+    crop = np.ascontiguousarray(image[y0:y1, x0:x1])
+    return crop, (top - y0, right - x0, bottom - y0, left - x0)
+
+
+class FaceEncoder:
+    """
+    Computes 128-d face encodings, spread over a pool of worker processes.
+
+    Each worker keeps the dlib models loaded. Faces are sent as small crops
+    in one batch per worker. With workers=1 everything runs in-process.
+
+    Workers are spawned rather than forked: the pool starts them lazily,
+    after the pipeline's threads are running, and forking a process that
+    holds other threads' locks can deadlock the child.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.workers = max(1, workers or 1)
+        self.pool = None
+        if self.workers > 1:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            mp_context=multiprocessing.get_context('spawn'))
+
+    def encode(self, rgb_image, locations):
+        """Encodings for the faces at locations (top, right, bottom, left) in an RGB image"""
+        if not locations:
+            return []
+
+        if self.pool is None:
+            import face_recognition
+            return face_recognition.face_encodings(rgb_image, list(locations))
+
+        return self.encode_crops([crop_face(rgb_image, location) for location in locations])
+
+    def encode_crops(self, crops):
+        """Encodings for a list of (crop, location within crop), batched across the workers"""
+        if not crops:
+            return []
+
+        if self.pool is None:
+            return _encode_crops(crops)
+
+        batch_size = -(-len(crops) // self.workers)
+        batches = [crops[i:i + batch_size] for i in range(0, len(crops), batch_size)]
+
+        encodings = []
+        for batch_encodings in self.pool.map(_encode_crops, batches):
+            encodings.extend(batch_encodings)
+        return encodings
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
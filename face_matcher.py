@@ -0,0 +1,183 @@
+import numpy as np
+
+
+def as_encoding_matrix(encodings):
+    """
+    Stack face encodings into one contiguous float32 matrix (one row per face)
+    """
+    matrix = np.asarray(encodings, dtype=np.float32)
+    if matrix.size == 0:
+        return np.empty((0, 128), dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    return np.ascontiguousarray(matrix)
+
+
+class FaceMatcher:
+    """
+    Exact nearest-neighbour matcher over the known face encodings.
+
+    The roster is held as a single float32 matrix so all faces of a frame are
+    scored against all students with one matrix product, using
+    |a - b|^2 = |a|^2 + |b|^2 - 2 a.b
+    """
+
+    def __init__(self, known_encodings, tolerance=0.6):
+        self.encodings = as_encoding_matrix(known_encodings)
+        self.squared_norms = np.einsum('ij,ij->i', self.encodings, self.encodings)
+        self.tolerance = tolerance
+
+    def __len__(self):
+        return self.encodings.shape[0]
+
+    def distances(self, face_encodings):
+        """
+        Euclidean distance from every face to every known student, shape (faces, students)
+        """
+        faces = as_encoding_matrix(face_encodings)
+        face_norms = np.einsum('ij,ij->i', faces, faces)
+
+        squared = face_norms[:, None] + self.squared_norms[None, :] - 2.0 * (faces @ self.encodings.T)
+        np.maximum(squared, 0.0, out=squared)
+        return np.sqrt(squared, out=squared)
+
+    def match(self, face_encodings):
+        """
+        Return (indices, distances) of the nearest known student for each face.
+        The index is -1 when the nearest student is further than the tolerance.
+        """
+        if len(face_encodings) == 0 or len(self) == 0:
+            count = len(face_encodings)
+            return np.full(count, -1, dtype=np.intp), np.full(count, np.inf, dtype=np.float32)
+
+        distances = self.distances(face_encodings)
+        indices = np.argmin(distances, axis=1)
+        best = distances[np.arange(len(indices)), indices]
+        indices[best > self.tolerance] = -1
+        return indices, best
+
+
+PRECISIONS = ('float32', 'float16', 'int8')
+
+
+class QuantizedMatcher:
+    """
+    Two-pass matcher for very large rosters.
+
+    The first pass scans a compact copy of the roster, float16 (2 bytes per
+    dimension) or int8 with a per-dimension scale and offset (1 byte), and
+    keeps the `rerank` closest candidates per face. Those few are then
+    re-scored against the exact float32 encodings, which can stay in the
+    memory-mapped roster file: only the candidate rows are ever read.
+
+    The scan goes chunk_size rows at a time, widening each chunk to float32
+    for the matrix product, so the extra working memory stays small. With
+    numpy that widening costs about as much as the bandwidth it saves: the
+    gain is the roster's footprint, not single-face latency.
+    """
+
+    def __init__(self, known_encodings, tolerance=0.6, precision='int8', rerank=10, chunk_size=8192):
+        if precision not in ('float16', 'int8'):
+            raise ValueError(f"precision must be float16 or int8, not {precision!r}")
+
+        self.exact = known_encodings if isinstance(known_encodings, np.ndarray) else as_encoding_matrix(known_encodings)
+        self.tolerance = tolerance
+        self.precision = precision
+        self.rerank = max(1, rerank)
+        self.chunk_size = chunk_size
+
+        count = len(self.exact)
+        dim = self.exact.shape[1] if self.exact.ndim == 2 else 128
+        if precision == 'float16':
+            self.codes = np.empty((count, dim), dtype=np.float16)
+            self.scale = np.ones(dim, dtype=np.float32)
+            self.offset = np.zeros(dim, dtype=np.float32)
+        else:
+            self.codes = np.empty((count, dim), dtype=np.int8)
+            low, high = self._value_range(dim)
+            self.scale = np.maximum((high - low) / 255.0, 1e-12).astype(np.float32)
+            self.offset = (low + 128.0 * self.scale).astype(np.float32)
+        self.squared_norms = np.empty(count, dtype=np.float32)
+
+        # Quantize chunk by chunk, so a memory-mapped roster is never held in full
+        for start in range(0, count, chunk_size):
+            chunk = np.asarray(self.exact[start:start + chunk_size], dtype=np.float32)
+            if precision == 'float16':
+                self.codes[start:start + len(chunk)] = chunk
+            else:
+                self.codes[start:start + len(chunk)] = np.clip(
+                    np.rint((chunk - self.offset) / self.scale), -128, 127)
+            decoded = self._decode(self.codes[start:start + len(chunk)])
+            self.squared_norms[start:start + len(chunk)] = np.einsum('ij,ij->i', decoded, decoded)
+
+    def _value_range(self, dim):
+        low = np.full(dim, np.inf, dtype=np.float32)
+        high = np.full(dim, -np.inf, dtype=np.float32)
+        for start in range(0, len(self.exact), self.chunk_size):
+            chunk = np.asarray(self.exact[start:start + self.chunk_size], dtype=np.float32)
+            np.minimum(low, chunk.min(axis=0), out=low)
+            np.maximum(high, chunk.max(axis=0), out=high)
+        if not np.all(np.isfinite(low)):
+            return np.zeros(dim, dtype=np.float32), np.ones(dim, dtype=np.float32)
+        return low, high
+
+    def _decode(self, codes):
+        return codes.astype(np.float32) * self.scale + self.offset
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        """Memory held by the first-pass roster"""
+        return self.codes.nbytes + self.squared_norms.nbytes + self.scale.nbytes + self.offset.nbytes
+
+    def candidates(self, faces):
+        """Indices of the `rerank` nearest students per face by approximate distance, shape (faces, k)"""
+        k = min(self.rerank, len(self))
+        face_norms = np.einsum('ij,ij->i', faces, faces)
+        # x = code * scale + offset, so faces.x = (faces * scale).code + faces.offset
+        scaled = faces * self.scale
+        shift = faces @ self.offset
+
+        squared = np.empty((len(faces), len(self)), dtype=np.float32)
+        for start in range(0, len(self), self.chunk_size):
+            codes = self.codes[start:start + self.chunk_size].astype(np.float32)
+            squared[:, start:start + len(codes)] = scaled @ codes.T
+
+        squared *= -2.0
+        squared += face_norms[:, None] - 2.0 * shift[:, None]
+        squared += self.squared_norms[None, :]
+        if k == len(self):
+            return np.broadcast_to(np.arange(k), (len(faces), k))
+        return np.argpartition(squared, k - 1, axis=1)[:, :k]
+
+    def match(self, face_encodings):
+        """Same contract as FaceMatcher.match, distances are exact"""
+        if len(face_encodings) == 0 or len(self) == 0:
+            count = len(face_encodings)
+            return np.full(count, -1, dtype=np.intp), np.full(count, np.inf, dtype=np.float32)
+
+        faces = as_encoding_matrix(face_encodings)
+        candidates = self.candidates(faces)
+
+        # Exact float32 distances for the candidates only
+        rows = np.unique(candidates)
+        exact = np.asarray(self.exact[rows], dtype=np.float32)
+        positions = np.searchsorted(rows, candidates)
+        distances = np.linalg.norm(exact[positions] - faces[:, None, :], axis=2)
+
+        nearest = np.argmin(distances, axis=1)
+        indices = candidates[np.arange(len(faces)), nearest]
+        best = distances[np.arange(len(faces)), nearest].astype(np.float32)
+        indices[best > self.tolerance] = -1
+        return indices, best
+
+
+def make_matcher(known_encodings, tolerance=0.6, precision='float32', rerank=10):
+    """The exact FaceMatcher for float32, otherwise a QuantizedMatcher at that precision"""
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {', '.join(PRECISIONS)}, not {precision!r}")
+    if precision == 'float32':
+        return FaceMatcher(known_encodings, tolerance=tolerance)
+    return QuantizedMatcher(known_encodings, tolerance=tolerance, precision=precision, rerank=rerank)
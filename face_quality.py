@@ -0,0 +1,76 @@
+import cv2
+import numpy as np
+
+THUMBNAIL_SIZE = 24
+
+
+class FaceQualityFilter:
+    """
+    Cheap checks run on a face before it is kept for enrollment, so the
+    encoder only sees sharp, well lit, frontal and varied faces.
+
+    - size: the shorter side of the face box, in pixels
+    - sharpness: variance of the Laplacian of the face, low means blurred
+    - brightness: mean gray level of the face
+    - pose: left/right asymmetry of the face, 0 is a perfectly frontal face
+    - diversity: mean difference to every face kept so far, so consecutive
+      near-identical frames are not all taken
+    """
+
+    def __init__(self, min_size=80, min_sharpness=60.0, brightness=(50, 210),
+                 max_asymmetry=0.18, min_difference=0.04):
+        self.min_size = min_size
+        self.min_sharpness = min_sharpness
+        self.brightness = brightness
+        self.max_asymmetry = max_asymmetry
+        self.min_difference = min_difference
+        self.kept = []  # Normalized thumbnails of accepted faces
+
+    def accept(self, gray, box):
+        """
+        Check the face at box (top, right, bottom, left) and remember it when
+        it passes. Returns None if it passed, otherwise the reason it failed.
+        """
+        reason, thumbnail = self._evaluate(gray, box)
+        if reason is None:
+            self.kept.append(thumbnail)
+        return reason
+
+    def _evaluate(self, gray, box):
+        top, right, bottom, left = box
+        face = gray[max(0, top):bottom, max(0, left):right]
+        if min(face.shape[:2]) < self.min_size:
+            return 'too small', None
+
+        brightness = face.mean()
+        if brightness < self.brightness[0]:
+            return 'too dark', None
+        if brightness > self.brightness[1]:
+            return 'too bright', None
+
+        if cv2.Laplacian(face, cv2.CV_64F).var() < self.min_sharpness:
+            return 'blurred', None
+
+        # A turned head makes the two halves of the face differ
+        thumbnail = self.thumbnail(face)
+        half = THUMBNAIL_SIZE // 2
+        if np.abs(thumbnail[:, :half] - thumbnail[:, -half:][:, ::-1]).mean() > self.max_asymmetry:
+            return 'not facing the camera', None
+
+        for kept in self.kept:
+            if np.abs(thumbnail - kept).mean() < self.min_difference:
+                return 'same as an earlier frame', None
+
+        return None, thumbnail
+
+    @staticmethod
+    def thumbnail(face):
+        # Small and contrast normalized, so lighting changes alone do not count as variety
+        small = cv2.resize(face, (THUMBNAIL_SIZE, THUMBNAIL_SIZE), interpolation=cv2.INTER_AREA)
+        small = cv2.equalizeHist(small)
+        return small.astype(np.float32) / 255
+
+
+def largest_face(boxes):
+    """The biggest (top, right, bottom, left) box, the person enrolling is the one closest to the camera"""
+    return max(boxes, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]), default=None)
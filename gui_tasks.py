@@ -0,0 +1,267 @@
+import queue
+import threading
+import tkinter as tk
+from tkinter import messagebox, ttk
+from datetime import datetime
+from database import REPORT_CHUNK_SIZE, STUDENT_PAGE_SIZE
+
+POLL_MS = 50
+MAX_CALLBACKS_PER_POLL = 20  # Keeps a burst of results from stalling the event loop
+SEARCH_DELAY_MS = 300
+
+STUDENT_FILTERS = ("All", "Present today", "Absent today")
+
+
+class BackgroundTasks:
+    """
+    Runs slow work (SQL, model loading) off the Tk main thread.
+
+    Worker threads never touch widgets: they hand callbacks to a queue that
+    the main thread drains every POLL_MS milliseconds with root.after().
+
+    Tasks started with the same key supersede each other, so when the user
+    clicks Refresh twice only the newest result is shown; a task can check
+    is_current(key, token) to stop early once it has been superseded.
+    """
+
+    def __init__(self, root, poll_ms=POLL_MS):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.callbacks = queue.Queue()
+        self.tokens = {}
+        self.lock = threading.Lock()
+        self.root.after(self.poll_ms, self.poll)
+
+    def post(self, callback, *args):
+        """Call callback(*args) on the Tk main thread; safe from any thread"""
+        self.callbacks.put((callback, args))
+
+    def run(self, key, func, on_done=None, on_error=None):
+        """
+        Run func(token) on a worker thread and pass its result to on_done on
+        the main thread, unless another task with this key started meanwhile
+        """
+        with self.lock:
+            token = self.tokens.get(key, 0) + 1
+            self.tokens[key] = token
+
+        def work():
+            try:
+                result = func(token)
+            except Exception as e:
+                if on_error and self.is_current(key, token):
+                    self.post(on_error, e)
+                else:
+                    print(f"Background task {key} failed: {e}")
+                return
+            if on_done and self.is_current(key, token):
+                self.post(on_done, result)
+
+        threading.Thread(target=work, name=f'Task-{key}', daemon=True).start()
+        return token
+
+    def is_current(self, key, token):
+        with self.lock:
+            return self.tokens.get(key) == token
+
+    def poll(self):
+        for _ in range(MAX_CALLBACKS_PER_POLL):
+            try:
+                callback, args = self.callbacks.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"GUI update failed: {e}")
+        self.root.after(self.poll_ms, self.poll)
+
+
+def show_error(error):
+    messagebox.showerror("Error", str(error))
+
+
+class StudentList:
+    """
+    Searchable, paged list of registered students, shared by both GUIs.
+
+    `source` is anything with count_students() and search_students(), the
+    AttendanceDatabase or SimpleFaceRecognition. Search and filter run in
+    SQL on a worker thread and one page of STUDENT_PAGE_SIZE rows is shown.
+    """
+
+    def __init__(self, parent, tasks, source):
+        self.parent = parent
+        self.tasks = tasks
+        self.source = source
+        self.page = 0
+        self.student_count = 0
+        self.search_after = None
+
+        # Search and filter, applied in SQL
+        search_frame = ttk.Frame(parent)
+        search_frame.pack(fill=tk.X, pady=(0, 5))
+
+        ttk.Label(search_frame, text="Search:").pack(side=tk.LEFT)
+        self.search_entry = ttk.Entry(search_frame, width=20)
+        self.search_entry.pack(side=tk.LEFT, padx=(5, 10))
+        self.search_entry.bind("<KeyRelease>", self.on_search_changed)
+
+        ttk.Label(search_frame, text="Show:").pack(side=tk.LEFT)
+        self.filter_var = tk.StringVar(value=STUDENT_FILTERS[0])
+        filter_box = ttk.Combobox(search_frame, textvariable=self.filter_var, values=STUDENT_FILTERS,
+                                  state="readonly", width=14)
+        filter_box.pack(side=tk.LEFT, padx=(5, 0))
+        filter_box.bind("<<ComboboxSelected>>", lambda event: self.load(page=0))
+
+        # One page of students at a time
+        pager_frame = ttk.Frame(parent)
+        pager_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=5)
+
+        ttk.Button(pager_frame, text="< Prev", command=lambda: self.load(page=self.page - 1)).pack(side=tk.LEFT)
+        self.page_label = ttk.Label(pager_frame, text="")
+        self.page_label.pack(side=tk.LEFT, padx=10)
+        ttk.Button(pager_frame, text="Next >", command=lambda: self.load(page=self.page + 1)).pack(side=tk.LEFT)
+        ttk.Button(pager_frame, text="Refresh", command=self.load).pack(side=tk.RIGHT)
+
+        # Treeview for students
+        columns = ("ID", "Name", "Roll Number")
+        self.tree = ttk.Treeview(parent, columns=columns, show="headings", height=10)
+        self.tree.heading("ID", text="ID")
+        self.tree.heading("Name", text="Name")
+        self.tree.heading("Roll Number", text="Roll Number")
+        self.tree.column("ID", width=50)
+        self.tree.column("Name", width=150)
+        self.tree.column("Roll Number", width=100)
+
+        scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.load()
+
+    def load(self, page=None):
+        """Fetch one page of the student list on a worker thread"""
+        if page is not None:
+            last_page = max(0, (self.student_count - 1) // STUDENT_PAGE_SIZE)
+            self.page = min(max(0, page), last_page)
+
+        search = self.search_entry.get().strip()
+        present_on, absent_on = self.student_filter()
+        offset = self.page * STUDENT_PAGE_SIZE
+
+        def query(token):
+            return (self.source.count_students(search, present_on, absent_on),
+                    self.source.search_students(search, present_on, absent_on, offset))
+
+        self.tasks.run('students', query, self.show, show_error)
+
+    def show(self, result):
+        count, students = result
+        self.student_count = count
+
+        if not students and self.page > 0:
+            # The list shrank since the page was chosen
+            self.load(page=(count - 1) // STUDENT_PAGE_SIZE)
+            return
+
+        # Clear existing items
+        self.tree.delete(*self.tree.get_children())
+        for student in students:
+            self.tree.insert("", tk.END, values=student)
+
+        pages = max(1, -(-count // STUDENT_PAGE_SIZE))
+        self.page_label.config(text=f"Page {self.page + 1} of {pages} ({count} students)")
+
+    def student_filter(self):
+        """(present_on, absent_on) dates for the selected filter"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        choice = self.filter_var.get()
+        if choice == "Present today":
+            return today, None
+        if choice == "Absent today":
+            return None, today
+        return None, None
+
+    def on_search_changed(self, event=None):
+        # Wait for a pause in typing before querying
+        if self.search_after is not None:
+            self.parent.after_cancel(self.search_after)
+        self.search_after = self.parent.after(SEARCH_DELAY_MS, lambda: self.load(page=0))
+
+
+class ReportView:
+    """
+    Date entry and text area of the Reports tab. The report is formatted on
+    a worker thread and streamed into the widget REPORT_CHUNK_SIZE lines at
+    a time; `source` is anything with iter_attendance_report(date).
+    """
+
+    def __init__(self, parent, tasks, source):
+        self.tasks = tasks
+        self.source = source
+
+        # Date selection
+        date_frame = ttk.Frame(parent)
+        date_frame.pack(pady=10)
+
+        ttk.Label(date_frame, text="Date (YYYY-MM-DD):").pack(side=tk.LEFT)
+        self.date_entry = ttk.Entry(date_frame, width=15)
+        self.date_entry.pack(side=tk.LEFT, padx=(10,0))
+
+        ttk.Button(date_frame, text="Generate Report", command=self.generate).pack(side=tk.LEFT, padx=(10,0))
+
+        # Report display
+        report_frame = ttk.LabelFrame(parent, text="Attendance Report", padding=10)
+        report_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        self.report_text = tk.Text(report_frame, height=15, width=60)
+        scrollbar = ttk.Scrollbar(report_frame, orient=tk.VERTICAL, command=self.report_text.yview)
+        self.report_text.configure(yscrollcommand=scrollbar.set)
+
+        self.report_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+    def generate(self):
+        date = self.date_entry.get().strip() or None
+
+        self.report_text.delete(1.0, tk.END)
+        self.report_text.insert(tk.END, report_header(date))
+
+        def stream(token):
+            # Generate daily report for a date, overall report otherwise
+            chunk = []
+            for line in report_lines(self.source.iter_attendance_report(date), date):
+                chunk.append(line)
+                if len(chunk) == REPORT_CHUNK_SIZE:
+                    if not self.tasks.is_current('report', token):
+                        return  # A newer report was requested
+                    self.tasks.post(self.append, token, ''.join(chunk))
+                    chunk = []
+            self.tasks.post(self.append, token, ''.join(chunk))
+
+        self.tasks.run('report', stream, on_error=show_error)
+
+    def append(self, token, text):
+        if self.tasks.is_current('report', token):
+            self.report_text.insert(tk.END, text)
+
+
+def report_header(date=None):
+    if date is None:
+        title, last_column = "Overall Attendance Report", "Total Days"
+    else:
+        title, last_column = f"Attendance Report for {date}", "Status"
+    return (f"{title}\n" + "=" * 50 + "\n"
+            + f"{'Name':<20} {'Roll Number':<15} {last_column:<10}\n" + "-" * 50 + "\n")
+
+
+def report_lines(report, date=None):
+    if date is None:
+        for name, roll, total_days in report:
+            yield f"{name:<20} {roll:<15} {total_days:<10}\n"
+    else:
+        for name, roll, date_att, time in report:
+            yield f"{name:<20} {roll:<15} {time or 'Absent':<10}\n"
@@ -0,0 +1,157 @@
+import os
+import re
+import glob
+import threading
+import cv2
+import numpy as np
+
+STORE_FILE = 'lbph_store'  # lbph_store.bin (histograms) + lbph_store.npz (labels, parameters)
+LEGACY_MODEL_FILE = 'lbph_model.yml'
+
+
+class LBPHStore:
+    """
+    Binary store of LBPH histograms, one float32 row per training face.
+
+    Histograms live in a raw append-only file that is memory-mapped at load
+    time; a small .npz side file holds the label (student id) of every row
+    and the LBPH parameters. Prediction is a nearest-neighbour search with
+    the same chi-square distance OpenCV's LBPH recognizer uses, so the
+    confidence threshold keeps its meaning.
+    """
+
+    def __init__(self, path=STORE_FILE, radius=1, neighbors=8, grid_x=8, grid_y=8, chunk_size=512):
+        self.bin_file = path + '.bin'
+        self.index_file = path + '.npz'
+        self.params = {'radius': radius, 'neighbors': neighbors, 'grid_x': grid_x, 'grid_y': grid_y}
+        self.chunk_size = chunk_size
+        self.labels = np.empty(0, dtype=np.int32)
+        self.histograms = None
+        # Used only to compute histograms with OpenCV's exact LBP implementation
+        self.extractor = cv2.face.LBPHFaceRecognizer_create(radius, neighbors, grid_x, grid_y)
+        self.extractor_lock = threading.Lock()
+
+    @property
+    def dim(self):
+        return (2 ** self.params['neighbors']) * self.params['grid_x'] * self.params['grid_y']
+
+    def __len__(self):
+        return len(self.labels)
+
+    def exists(self):
+        return os.path.exists(self.index_file)
+
+    def load(self):
+        """Memory-map the stored histograms, returns the number of rows"""
+        if not self.exists():
+            return 0
+
+        with np.load(self.index_file) as index:
+            self.labels = index['labels']
+            self.params = {key: int(index[key]) for key in self.params}
+            self.extractor = cv2.face.LBPHFaceRecognizer_create(**self.params)
+
+        if len(self.labels):
+            self.histograms = np.memmap(self.bin_file, dtype=np.float32, mode='r', shape=(len(self.labels), self.dim))
+        return len(self.labels)
+
+    def compute_histograms(self, faces):
+        """LBPH spatial histograms of grayscale face images, shape (faces, dim)"""
+        with self.extractor_lock:
+            self.extractor.train(list(faces), np.zeros(len(faces), dtype=np.int32))
+            return np.vstack(self.extractor.getHistograms()).astype(np.float32)
+
+    def add(self, student_id, faces):
+        """Append the histograms of one student's training faces"""
+        histograms = self.compute_histograms(faces)
+        self.append(np.full(len(histograms), student_id, dtype=np.int32), histograms)
+
+    def append(self, labels, histograms):
+        """Append labelled histogram rows and update the side index"""
+        histograms = np.ascontiguousarray(histograms, dtype=np.float32).reshape(-1, self.dim)
+        labels = np.concatenate((self.labels, np.asarray(labels, dtype=np.int32)))
+
+        # Drop the memmap before writing, and overwrite any partial tail left by an interrupted write
+        self.histograms = None
+        mode = 'r+b' if os.path.exists(self.bin_file) else 'wb'
+        with open(self.bin_file, mode) as f:
+            f.seek(len(self.labels) * self.dim * 4)
+            f.write(histograms.tobytes())
+            f.truncate()
+
+        tmp_file = self.index_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            np.savez(f, labels=labels, **self.params)
+        os.replace(tmp_file, self.index_file)
+
+        self.labels = labels
+        self.histograms = np.memmap(self.bin_file, dtype=np.float32, mode='r', shape=(len(labels), self.dim))
+
+    def predict(self, face):
+        """
+        Return (student_id, distance) of the closest stored histogram,
+        like LBPHFaceRecognizer.predict
+        """
+        if self.histograms is None:
+            return -1, float('inf')
+
+        query = self.compute_histograms([face])[0]
+        best_label, best_distance = -1, float('inf')
+
+        for start in range(0, len(self.labels), self.chunk_size):
+            chunk = self.histograms[start:start + self.chunk_size]
+            # Chi-square (alternative) distance, as cv2.HISTCMP_CHISQR_ALT
+            diff = chunk - query
+            total = chunk + query
+            terms = np.divide(diff * diff, total, out=np.zeros_like(diff), where=total > np.finfo(np.float32).eps)
+            distances = 2.0 * terms.sum(axis=1, dtype=np.float64)
+
+            i = int(np.argmin(distances))
+            if distances[i] < best_distance:
+                best_label, best_distance = int(self.labels[start + i]), float(distances[i])
+
+        return best_label, best_distance
+
+
+def read_yaml_model(model_file, label=None):
+    """Histograms and labels of an OpenCV LBPH YAML model, optionally relabelled"""
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.read(model_file)
+    histograms = np.vstack(recognizer.getHistograms()).astype(np.float32)
+    labels = recognizer.getLabels().ravel().astype(np.int32)
+    if label is not None:
+        labels = np.full(len(histograms), label, dtype=np.int32)
+    return histograms, labels
+
+
+def convert_yaml_models(store, model_dir='.'):
+    """
+    One-shot conversion of existing YAML models into the binary store.
+    Uses the shared lbph_model.yml when present, otherwise the old
+    per-student model_{id}.yml files.
+    """
+    shared_model = os.path.join(model_dir, LEGACY_MODEL_FILE)
+    if os.path.exists(shared_model):
+        sources = [(shared_model, None)]
+    else:
+        sources = []
+        for model_file in sorted(glob.glob(os.path.join(model_dir, 'model_*.yml'))):
+            match = re.fullmatch(r'model_(\d+)\.yml', os.path.basename(model_file))
+            if match:
+                sources.append((model_file, int(match.group(1))))
+
+    for model_file, label in sources:
+        histograms, labels = read_yaml_model(model_file, label)
+        store.append(labels, histograms)
+        print(f"Converted {model_file} ({len(labels)} histograms)")
+
+    return len(sources)
+
+
+if __name__ == "__main__":
+    store = LBPHStore()
+    if store.load():
+        print(f"{store.index_file} already holds {len(store)} histograms.")
+    else:
+        converted = convert_yaml_models(store)
+        print(f"Converted {converted} model file(s) into {store.bin_file}.")
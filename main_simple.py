@@ -2,6 +2,7 @@ import tkinter as tk
 from tkinter import messagebox, simpledialog, ttk
 from simple_face_recognition import SimpleFaceRecognition
 import threading
+from gui_tasks import BackgroundTasks, ReportView, StudentList, show_error
 
 class AttendanceSystemGUI:
     def __init__(self, root):
@@ -11,6 +12,9 @@ class AttendanceSystemGUI:
 
         self.fr = SimpleFaceRecognition()
 
+        # SQL and model loading run on worker threads, widgets are only touched here
+        self.tasks = BackgroundTasks(root)
+
         # Create notebook for tabs
         self.notebook = ttk.Notebook(root)
         self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -50,25 +54,7 @@ class AttendanceSystemGUI:
         list_frame = ttk.LabelFrame(self.students_frame, text="Registered Students", padding=10)
         list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
-        # Treeview for students
-        columns = ("ID", "Name", "Roll Number")
-        self.students_tree = ttk.Treeview(list_frame, columns=columns, show="headings", height=10)
-        self.students_tree.heading("ID", text="ID")
-        self.students_tree.heading("Name", text="Name")
-        self.students_tree.heading("Roll Number", text="Roll Number")
-        self.students_tree.column("ID", width=50)
-        self.students_tree.column("Name", width=150)
-        self.students_tree.column("Roll Number", width=100)
-
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.students_tree.yview)
-        self.students_tree.configure(yscrollcommand=scrollbar.set)
-
-        self.students_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-        ttk.Button(list_frame, text="Refresh", command=self.load_students).pack(pady=5)
-
-        self.load_students()
+        self.student_list = StudentList(list_frame, self.tasks, self.fr)
 
     def setup_attendance_tab(self):
         ttk.Label(self.attendance_frame, text="Real-time Face Recognition Attendance", font=("Arial", 14)).pack(pady=20)
@@ -80,26 +66,7 @@ class AttendanceSystemGUI:
         self.status_label.pack(pady=10)
 
     def setup_reports_tab(self):
-        # Date selection
-        date_frame = ttk.Frame(self.reports_frame)
-        date_frame.pack(pady=10)
-
-        ttk.Label(date_frame, text="Date (YYYY-MM-DD):").pack(side=tk.LEFT)
-        self.date_entry = ttk.Entry(date_frame, width=15)
-        self.date_entry.pack(side=tk.LEFT, padx=(10,0))
-
-        ttk.Button(date_frame, text="Generate Report", command=self.generate_report).pack(side=tk.LEFT, padx=(10,0))
-
-        # Report display
-        report_frame = ttk.LabelFrame(self.reports_frame, text="Attendance Report", padding=10)
-        report_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-
-        self.report_text = tk.Text(report_frame, height=15, width=60)
-        scrollbar = ttk.Scrollbar(report_frame, orient=tk.VERTICAL, command=self.report_text.yview)
-        self.report_text.configure(yscrollcommand=scrollbar.set)
-
-        self.report_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.report_view = ReportView(self.reports_frame, self.tasks, self.fr)
 
     def add_student(self):
         name = self.name_entry.get().strip()
@@ -114,34 +81,25 @@ class AttendanceSystemGUI:
             messagebox.showinfo("Success", f"Student {name} ({roll}) added successfully!")
             self.name_entry.delete(0, tk.END)
             self.roll_entry.delete(0, tk.END)
-            self.load_students()
+            self.student_list.load()
         else:
             messagebox.showerror("Error", "Failed to add student. Please try again.")
 
-    def load_students(self):
-        # Clear existing items
-        for item in self.students_tree.get_children():
-            self.students_tree.delete(item)
-
-        # Load students from database
-        conn = sqlite3.connect('attendance.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, name, roll_number FROM students')
-        students = cursor.fetchall()
-        conn.close()
-
-        for student in students:
-            self.students_tree.insert("", tk.END, values=student)
+    def set_status(self, text, color):
+        self.status_label.config(text=text, foreground=color)
 
     def start_recognition(self):
-        self.status_label.config(text="Status: Running recognition...", foreground="green")
+        self.set_status("Status: Loading models...", "blue")
         # Load models
-        model_count = self.fr.load_all_models()
+        self.tasks.run('models', lambda token: self.fr.load_all_models(), self.on_models_loaded, show_error)
+
+    def on_models_loaded(self, model_count):
         if model_count == 0:
             messagebox.showerror("Error", "No trained face models found. Please add students first.")
-            self.status_label.config(text="Status: No models found", foreground="red")
+            self.set_status("Status: No models found", "red")
             return
 
+        self.set_status("Status: Running recognition...", "green")
         # Run recognition in a separate thread to avoid freezing GUI
         recognition_thread = threading.Thread(target=self.run_recognition)
         recognition_thread.daemon = True
@@ -151,42 +109,10 @@ class AttendanceSystemGUI:
         try:
             self.fr.recognize_and_mark_attendance()
         finally:
-            self.status_label.config(text="Status: Recognition stopped", foreground="blue")
-
-    def generate_report(self):
-        date = self.date_entry.get().strip()
-        if not date:
-            # Generate overall report
-            report = self.fr.get_attendance_report()
-            self.display_report(report, overall=True)
-        else:
-            # Generate daily report
-            report = self.fr.get_attendance_report(date)
-            self.display_report(report, date=date)
-
-    def display_report(self, report, date=None, overall=False):
-        self.report_text.delete(1.0, tk.END)
-
-        if overall:
-            self.report_text.insert(tk.END, "Overall Attendance Report\n")
-            self.report_text.insert(tk.END, "=" * 50 + "\n")
-            self.report_text.insert(tk.END, f"{'Name':<20} {'Roll Number':<15} {'Total Days':<10}\n")
-            self.report_text.insert(tk.END, "-" * 50 + "\n")
-
-            for name, roll, total_days in report:
-                self.report_text.insert(tk.END, f"{name:<20} {roll:<15} {total_days:<10}\n")
-        else:
-            self.report_text.insert(tk.END, f"Attendance Report for {date}\n")
-            self.report_text.insert(tk.END, "=" * 50 + "\n")
-            self.report_text.insert(tk.END, f"{'Name':<20} {'Roll Number':<15} {'Status':<10}\n")
-            self.report_text.insert(tk.END, "-" * 50 + "\n")
-
-            for name, roll, date_att, time in report:
-                status = time if time else "Absent"
-                self.report_text.insert(tk.END, f"{name:<20} {roll:<15} {status:<10}\n")
+            # Not on the Tk thread, hand the update to the main loop
+            self.tasks.post(self.set_status, "Status: Recognition stopped", "blue")
 
 if __name__ == "__main__":
-    import sqlite3
     root = tk.Tk()
     app = AttendanceSystemGUI(root)
     root.mainloop()
@@ -0,0 +1,168 @@
+import os
+import json
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+import cv2
+import numpy as np
+
+# A shared no-op context, so disabled timers allocate nothing
+_NULL_TIMER = nullcontext()
+
+
+class RollingStats:
+    """
+    Durations and finish times of the last `window` samples of one stage.
+    A stage can be timed from several threads (one per camera) while the
+    writer or the overlay reads a summary, so both sides take the lock.
+    """
+
+    def __init__(self, window=1000):
+        self.samples = deque(maxlen=window)  # (finished at, seconds)
+        self.count = 0
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, seconds, now):
+        with self.lock:
+            self.samples.append((now, seconds))
+            self.count += 1
+            self.total += seconds
+
+    def summary(self, now):
+        # Copy under the lock, do the percentile work outside it
+        with self.lock:
+            samples = list(self.samples)
+            count, total = self.count, self.total
+        if not samples:
+            return None
+
+        durations = np.array([seconds for _, seconds in samples]) * 1000
+        p50, p95, p99 = np.percentile(durations, [50, 95, 99])
+        span = now - samples[0][0]
+        return {
+            'count': count,
+            'fps': len(samples) / span if span > 0 else 0.0,
+            'p50_ms': float(p50),
+            'p95_ms': float(p95),
+            'p99_ms': float(p99),
+            'mean_ms': total * 1000 / count,
+        }
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, time.perf_counter() - self.start)
+
+
+class StageMetrics:
+    """
+    Latency and throughput of every step of the recognition loop: capture,
+    face detection, encoding, matching, attendance writes and display.
+
+    Each stage keeps its last `window` timings for p50/p95/p99 and fps.
+    When `path` is set, a snapshot is written there every `interval`
+    seconds, as Prometheus text if the name ends in .prom and JSON otherwise.
+
+    With enabled=False timer() hands back a shared no-op context and
+    record() returns at once, so hooks can stay in place permanently.
+    """
+
+    def __init__(self, enabled=True, path=None, interval=5.0, window=1000):
+        self.enabled = enabled
+        self.path = path
+        self.interval = interval
+        self.window = window
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.last_write = self.started
+
+    def timer(self, name):
+        """Context manager recording the time spent in the block under `name`"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+
+        stats = self.stages.get(name)
+        if stats is None:
+            with self.lock:
+                stats = self.stages.setdefault(name, RollingStats(self.window))
+        stats.add(seconds, time.monotonic())
+
+    def snapshot(self):
+        now = time.monotonic()
+        stages = {}
+        with self.lock:
+            items = sorted(self.stages.items())
+        for name, stats in items:
+            summary = stats.summary(now)
+            if summary is not None:
+                stages[name] = summary
+        return {'timestamp': time.time(), 'uptime': now - self.started, 'stages': stages}
+
+    def maybe_write(self):
+        """Write a snapshot if `interval` seconds have passed since the last one"""
+        if self.enabled and self.path and time.monotonic() - self.last_write >= self.interval:
+            self.write()
+
+    def write(self):
+        if not (self.enabled and self.path):
+            return
+
+        self.last_write = time.monotonic()
+        snapshot = self.snapshot()
+        text = prometheus_text(snapshot) if self.path.endswith('.prom') else json.dumps(snapshot, indent=2)
+
+        # Replace the file in one step so readers never see half a snapshot
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(text + '\n')
+        os.replace(tmp_path, self.path)
+
+    def draw(self, frame):
+        """Overlay p50/p95 latency and fps of every stage in the frame's top left corner"""
+        if not self.enabled:
+            return
+
+        y = 20
+        for name, stats in self.snapshot()['stages'].items():
+            text = f"{name}: {stats['p50_ms']:.1f}/{stats['p95_ms']:.1f} ms  {stats['fps']:.1f} fps"
+            cv2.putText(frame, text, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 3)
+            cv2.putText(frame, text, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 255), 1)
+            y += 18
+
+
+DISABLED = StageMetrics(enabled=False)
+
+
+def prometheus_text(snapshot):
+    """Prometheus exposition format for a StageMetrics snapshot"""
+    lines = ['# TYPE attendance_stage_latency_seconds summary']
+    for name, stats in snapshot['stages'].items():
+        for quantile, key in (('0.5', 'p50_ms'), ('0.95', 'p95_ms'), ('0.99', 'p99_ms')):
+            lines.append(f'attendance_stage_latency_seconds{{stage="{name}",quantile="{quantile}"}} '
+                         f'{stats[key] / 1000:.6f}')
+        lines.append(f'attendance_stage_latency_seconds_sum{{stage="{name}"}} '
+                     f'{stats["mean_ms"] * stats["count"] / 1000:.6f}')
+        lines.append(f'attendance_stage_latency_seconds_count{{stage="{name}"}} {stats["count"]}')
+
+    lines.append('# TYPE attendance_stage_fps gauge')
+    for name, stats in snapshot['stages'].items():
+        lines.append(f'attendance_stage_fps{{stage="{name}"}} {stats["fps"]:.3f}')
+    return '\n'.join(lines)
@@ -0,0 +1,373 @@
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+from metrics import DISABLED
+
+# Marks the end of the frame stream (camera closed or video file finished)
+END = object()
+
+
+class Face:
+    """A detected face and what the pipeline learned about it"""
+
+    def __init__(self, box, track_id=None):
+        self.box = box  # (top, right, bottom, left)
+        self.track_id = track_id
+        self.cached = False  # Identity came from the track's identity cache
+        self.encoding = None
+        self.student_id = None
+        self.name = None
+        self.roll = None
+        self.distance = None
+
+    @property
+    def known(self):
+        return self.student_id is not None
+
+    @property
+    def label(self):
+        return f"{self.name} ({self.roll})" if self.known else "Unknown"
+
+
+class FramePacket:
+    """A captured frame travelling through the pipeline stages"""
+
+    def __init__(self, frame, seq, source=0):
+        self.frame = frame
+        self.seq = seq
+        self.source = source
+        self.timestamp = time.time()
+        self.captured_at = time.monotonic()
+        self.faces = []
+        self.data = {}  # Per-stage scratch space, e.g. the RGB or gray frame
+
+
+def put_latest(q, item):
+    """Put without blocking, dropping the oldest queued item when the queue is full"""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+
+def put_end(q, stop_event):
+    """Put END, waiting for room so it is never dropped, unless the pipeline is stopping"""
+    while not stop_event.is_set():
+        try:
+            q.put(END, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+
+def open_capture(source, width=640, height=480):
+    """
+    Open a frame source: a camera index (0, "1"), an RTSP/HTTP URL or a video file
+    """
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+
+    capture = cv2.VideoCapture(source)
+    if isinstance(source, int):
+        # Set video resolution
+        capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    return capture
+
+
+def is_video_file(source):
+    return isinstance(source, str) and not source.isdigit() and '://' not in source
+
+
+class FrameGrabber(threading.Thread):
+    """
+    Capture stage: reads the camera as fast as it delivers and hands frames
+    on with a latest-frame-wins policy, so the camera buffer never backs up
+    behind slow processing. Video files are played back at their own frame
+    rate so they behave like a camera.
+    """
+
+    def __init__(self, capture, outbox, stop_event, source=0, realtime=False, metrics=DISABLED):
+        super().__init__(name=f'FrameGrabber-{source}', daemon=True)
+        self.capture = capture
+        self.outbox = outbox
+        self.stop_event = stop_event
+        self.source = source
+        self.metrics = metrics
+        self.frames_read = 0
+        self.frame_interval = 0.0
+        if realtime:
+            fps = capture.get(cv2.CAP_PROP_FPS)
+            self.frame_interval = 1.0 / fps if fps and fps > 0 else 1.0 / 30
+
+    def run(self):
+        next_frame = time.monotonic()
+        while not self.stop_event.is_set():
+            with self.metrics.timer(f'capture-{self.source}'):
+                ret, frame = self.capture.read()
+            if not ret:
+                break
+            self.frames_read += 1
+            put_latest(self.outbox, FramePacket(frame, self.frames_read, self.source))
+
+            if self.frame_interval:
+                next_frame += self.frame_interval
+                time.sleep(max(0.0, next_frame - time.monotonic()))
+        put_end(self.outbox, self.stop_event)
+
+
+class Stage(threading.Thread):
+    """
+    One processing step in its own thread. func takes a FramePacket and
+    returns it (or None to drop the frame); results go to a bounded queue
+    that drops its oldest frame when the next stage falls behind.
+    """
+
+    def __init__(self, name, func, inbox, outbox, stop_event, metrics=DISABLED):
+        super().__init__(name=f'Stage-{name}', daemon=True)
+        self.stage_name = name
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stop_event = stop_event
+        self.metrics = metrics
+        self.frames_processed = 0
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                packet = self.inbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if packet is END:
+                put_end(self.outbox, self.stop_event)
+                break
+
+            try:
+                with self.metrics.timer(self.stage_name):
+                    packet = self.func(packet)
+            except Exception as e:
+                print(f"{self.name} failed on frame {packet.seq}: {e}")
+                continue
+
+            if packet is not None:
+                self.frames_processed += 1
+                put_latest(self.outbox, packet)
+
+
+class RecognitionPipeline:
+    """
+    capture -> stage -> stage -> ... -> results(), each step in its own
+    thread and connected by small bounded queues.
+
+    Stages run in parallel on consecutive frames; because every queue keeps
+    only the newest frames, end-to-end latency stays bounded by the slowest
+    stage instead of growing with the camera backlog.
+
+    Several sources can feed one pipeline: each gets its own capture thread
+    and its own copy of the stages (from make_stages(source)), and all of
+    them deliver into one results() stream tagged with packet.source.
+    Anything shared between sources, like the matcher or the attendance
+    writer, is shared by closing over it in make_stages.
+
+    metrics (a metrics.StageMetrics) times the capture and every stage.
+    """
+
+    def __init__(self, captures, make_stages, queue_size=2, realtime_sources=(), metrics=DISABLED):
+        self.stop_event = threading.Event()
+        self.metrics = metrics
+        self.output = queue.Queue(maxsize=queue_size * len(captures))
+        self.grabbers = {}
+        self.stages = {}
+
+        for source, capture in captures.items():
+            stages = make_stages(source)
+            queues = [queue.Queue(maxsize=1)] + [queue.Queue(maxsize=queue_size) for _ in stages[:-1]] + [self.output]
+
+            self.grabbers[source] = FrameGrabber(capture, queues[0], self.stop_event, source,
+                                                 realtime=source in realtime_sources, metrics=metrics)
+            self.stages[source] = [Stage(f'{name}-{source}', func, queues[i], queues[i + 1], self.stop_event, metrics)
+                                   for i, (name, func) in enumerate(stages)]
+
+        self.last_seq = {source: 0 for source in captures}
+        self.delivered = {source: 0 for source in captures}
+        self.fps_mark = (time.monotonic(), {source: (0, 0) for source in captures})
+
+    def threads(self):
+        for source, grabber in self.grabbers.items():
+            yield grabber
+            yield from self.stages[source]
+
+    def start(self):
+        for thread in self.threads():
+            thread.start()
+        return self
+
+    def results(self):
+        """Yield processed packets in capture order per source until every stream ends or stop() is called"""
+        running = len(self.grabbers)
+        while running and not self.stop_event.is_set():
+            try:
+                packet = self.output.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if packet is END:
+                running -= 1
+                continue
+            if packet.seq <= self.last_seq[packet.source]:
+                continue  # Older than a frame already delivered
+            self.last_seq[packet.source] = packet.seq
+            self.delivered[packet.source] += 1
+            yield packet
+
+    def fps(self):
+        """
+        Per-source (captured fps, processed fps) since the previous call
+        """
+        now = time.monotonic()
+        since, previous = self.fps_mark
+        elapsed = max(now - since, 1e-6)
+
+        counts = {source: (grabber.frames_read, self.delivered[source]) for source, grabber in self.grabbers.items()}
+        rates = {source: ((read - previous[source][0]) / elapsed, (done - previous[source][1]) / elapsed)
+                 for source, (read, done) in counts.items()}
+
+        self.fps_mark = (now, counts)
+        return rates
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self.threads():
+            thread.join()
+        self.metrics.write()
+
+
+def draw_faces(frame, faces):
+    """Draw a box and label for every face, green when known, red otherwise"""
+    for face in faces:
+        top, right, bottom, left = face.box
+        color = (0, 255, 0) if face.known else (0, 0, 255)
+        cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+        cv2.putText(frame, face.label, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+
+def report_fps(pipeline):
+    for source, (captured, processed) in pipeline.fps().items():
+        print(f"Source {source}: capturing {captured:.1f} fps, processing {processed:.1f} fps")
+
+
+class PreviewRenderer(threading.Thread):
+    """
+    Shows the newest annotated frame of every source from its own thread, at
+    most max_fps times a second, so drawing and window refresh never hold up
+    processing. Frames that arrive faster than that are simply skipped.
+
+    Each source is drawn into its own preallocated buffer rather than a new
+    copy per frame, which also leaves the packet's frame untouched.
+    """
+
+    def __init__(self, title='Attendance System', max_fps=15.0, metrics=DISABLED, overlay=False, on_quit=None,
+                 multiple_sources=False):
+        super().__init__(name='PreviewRenderer', daemon=True)
+        self.title = title
+        self.multiple_sources = multiple_sources
+        self.interval = 1.0 / max_fps if max_fps and max_fps > 0 else 0.0
+        self.metrics = metrics
+        self.overlay = overlay
+        self.on_quit = on_quit
+        self.latest = {}  # source -> newest packet not yet shown
+        self.buffers = {}  # source -> preview image
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.windows = set()
+
+    def submit(self, packet):
+        """Offer a processed packet for display; returns at once"""
+        with self.lock:
+            self.latest[packet.source] = packet
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+    def run(self):
+        next_frame = time.monotonic()
+        while not self.stop_event.is_set():
+            with self.lock:
+                packets, self.latest = self.latest, {}
+
+            with self.metrics.timer('display'):
+                for packet in packets.values():
+                    self.render(packet)
+                key = cv2.waitKey(1) & 0xFF
+
+            if key == ord('q'):
+                if self.on_quit:
+                    self.on_quit()
+                break
+
+            next_frame += self.interval
+            time.sleep(max(0.0, next_frame - time.monotonic()))
+            next_frame = max(next_frame, time.monotonic())
+
+        for window in self.windows:
+            cv2.destroyWindow(window)
+
+    def render(self, packet):
+        buffer = self.buffers.get(packet.source)
+        if buffer is None or buffer.shape != packet.frame.shape:
+            buffer = self.buffers[packet.source] = np.empty_like(packet.frame)
+        np.copyto(buffer, packet.frame)
+
+        draw_faces(buffer, packet.faces)
+        if self.overlay:
+            self.metrics.draw(buffer)
+
+        window = f"{self.title} [{packet.source}]" if self.multiple_sources else self.title
+        self.windows.add(window)
+        cv2.imshow(window, buffer)
+
+
+def show_results(pipeline, title='Attendance System', fps_interval=10.0, overlay=False, preview_fps=15.0,
+                 headless=False):
+    """
+    Consume results until 'q' is pressed in a preview window or every stream
+    has ended. Per-source FPS is printed every fps_interval seconds.
+
+    The preview runs on a PreviewRenderer thread capped at preview_fps; with
+    headless there is no window at all and the loop stops on Ctrl+C. With
+    overlay, the pipeline's stage timings are drawn on the preview.
+    """
+    last_report = time.monotonic()
+    metrics = pipeline.metrics
+
+    renderer = None
+    if not headless:
+        # 'q' in the window stops the pipeline, which ends results()
+        renderer = PreviewRenderer(title, preview_fps, metrics, overlay, on_quit=pipeline.stop_event.set,
+                                   multiple_sources=len(pipeline.grabbers) > 1)
+        renderer.start()
+
+    try:
+        for packet in pipeline.results():
+            if renderer is not None:
+                renderer.submit(packet)
+
+            if time.monotonic() - last_report >= fps_interval:
+                report_fps(pipeline)
+                last_report = time.monotonic()
+            metrics.maybe_write()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if renderer is not None:
+            renderer.stop()
@@ -2,83 +2,153 @@ import cv2
 import face_recognition
 import pickle
 from datetime import datetime
-from train_faces import load_known_faces
+from functools import partial
+from train_faces import load_roster
 from database import AttendanceDatabase
+from ann_index import load_matcher
+from face_matcher import PRECISIONS
+from attendance_writer import AttendanceWriter
+from batch_recognition import run_batch
+from face_encoder import FaceEncoder, DEFAULT_WORKERS
+from pipeline import Face, RecognitionPipeline, open_capture, is_video_file, show_results, report_fps
+from tracking import FaceTracker, IdentityCache
+from metrics import StageMetrics, DISABLED
+
+def detect_faces(packet, tracker, identities, metrics=DISABLED):
+    """
+    Pipeline stage: find face locations in the frame. The HOG detector only
+    runs when the tracker asks for it; in between faces are tracked, and
+    faces whose track already has an identity skip encoding and matching.
+    """
+    # Convert to RGB for face_recognition
+    rgb_frame = cv2.cvtColor(packet.frame, cv2.COLOR_BGR2RGB)
+    gray = cv2.cvtColor(packet.frame, cv2.COLOR_BGR2GRAY)
+    packet.data['rgb'] = rgb_frame
+
+    def detect():
+        with metrics.timer('face_locations'):
+            return face_recognition.face_locations(rgb_frame)
+
+    tracks = tracker.update(gray, detect)
+    packet.faces = [Face(track.box, track.id) for track in tracks]
+    identities.apply(packet.faces, {track.id for track in tracks})
+    return packet
+
+def encode_faces(packet, encoder):
+    """
+    Pipeline stage: compute the 128-d encoding of every face not yet identified
+    """
+    pending = [face for face in packet.faces if not face.cached]
+    if pending:
+        encodings = encoder.encode(packet.data['rgb'], [face.box for face in pending])
+        for face, encoding in zip(pending, encodings):
+            face.encoding = encoding
+    return packet
+
+def match_faces(packet, roster, matcher, writer, identities, confident_distance=0.5):
+    """
+    Pipeline stage: identify faces against the roster and queue attendance.
+    Matches closer than confident_distance, and clear misses, are cached on
+    the face's track.
+    """
+    pending = [face for face in packet.faces if face.encoding is not None]
+    if not pending:
+        return packet
 
-def recognize_and_mark_attendance():
+    # Score every face against the whole roster in one batch
+    match_indices, distances = matcher.match([face.encoding for face in pending])
+
+    for face, best_match_index, distance in zip(pending, match_indices, distances):
+        # Nearest known student within tolerance
+        if best_match_index < 0:
+            identities.remember(face)
+            continue
+
+        face.student_id = roster.ids[best_match_index]
+        face.name = roster.names[best_match_index]
+        face.roll = roster.rolls[best_match_index]
+        face.distance = float(distance)
+        identities.remember(face, confident=face.distance <= confident_distance)
+
+        # Mark attendance; the writer ignores students already marked today by any camera
+        now = datetime.now()
+        date = now.strftime("%Y-%m-%d")
+        time = now.strftime("%H:%M:%S")
+
+        writer.mark(face.student_id, date, time, face.name, face.roll)
+
+    return packet
+
+def recognize_and_mark_attendance(nprobe=None, workers=DEFAULT_WORKERS, detect_every=5, sources=(0,),
+                                  metrics_file=None, overlay=False, preview_fps=15.0, headless=False,
+                                  precision='float32'):
     """
     Real-time face recognition and attendance marking
+
+    Capture, detection, encoding and matching run as separate pipeline
+    stages (pipeline.py). The preview is drawn on its own thread at most
+    preview_fps times a second, or not at all when headless.
+    nprobe switches matching to the approximate index (ann_index.py) when one
+    has been built; higher values trade speed for recall. Without it,
+    precision float16 or int8 scans a compact copy of the roster and
+    re-ranks the closest candidates exactly, to save memory on big rosters.
+    workers is the number of face encoding processes, 1 encodes in-process.
+    The detector runs every detect_every frames (1 = every frame), faces are
+    tracked in between.
+
+    sources is a list of camera indexes, RTSP URLs or video files. Every
+    source gets its own capture, detection and tracking threads; the roster
+    matcher, the encoder pool and the attendance writer are shared, so a
+    student seen by two cameras is marked once.
+
+    Stage timings are collected when metrics_file is given (written every
+    few seconds, .prom for Prometheus text, otherwise JSON) or overlay is
+    set (drawn on the video).
     """
     # Load known faces
-    known_encodings, known_names, known_rolls = load_known_faces()
+    roster = load_roster()
 
-    if not known_encodings:
+    if len(roster.encodings) == 0:
         print("No trained faces found. Please train some faces first.")
         return
 
-    db = AttendanceDatabase()
-    cap = cv2.VideoCapture(0)
+    matcher = load_matcher(roster.encodings, roster.rolls, nprobe=nprobe, tolerance=0.6, precision=precision)
+
+    metrics = StageMetrics(path=metrics_file) if metrics_file or overlay else DISABLED
 
-    # Set video resolution
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    # Attendance is committed off the frame loop, in batches
+    writer = AttendanceWriter(metrics=metrics)
+    writer.start()
 
-    recognized_today = set()  # Track who has been recognized today
+    encoder = FaceEncoder(workers)
+
+    captures = {source: open_capture(source) for source in sources}
+
+    def make_stages(source):
+        identities = IdentityCache()  # Who each tracked face is
+        return [
+            ('detect', partial(detect_faces, tracker=FaceTracker(detect_every), identities=identities, metrics=metrics)),
+            ('encode', partial(encode_faces, encoder=encoder)),
+            ('match', partial(match_faces, roster=roster, matcher=matcher, writer=writer, identities=identities)),
+        ]
+
+    pipeline = RecognitionPipeline(captures, make_stages,
+                                   realtime_sources=[source for source in sources if is_video_file(source)],
+                                   metrics=metrics)
 
     print("Starting attendance recognition. Press 'q' to quit.")
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        # Convert to RGB for face_recognition
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        # Detect faces
-        face_locations = face_recognition.face_locations(rgb_frame)
-        face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-
-        for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-            # Compare with known faces
-            matches = face_recognition.compare_faces(known_encodings, face_encoding, tolerance=0.6)
-            name = "Unknown"
-            roll = ""
-
-            # Find the best match
-            if True in matches:
-                best_match_index = matches.index(True)
-                name = known_names[best_match_index]
-                roll = known_rolls[best_match_index]
-
-                # Mark attendance if not already marked today
-                if roll not in recognized_today:
-                    now = datetime.now()
-                    date = now.strftime("%Y-%m-%d")
-                    time = now.strftime("%H:%M:%S")
-
-                    student_data = db.get_student_by_roll(roll)
-                    if student_data:
-                        student_id = student_data[0]
-                        if db.mark_attendance(student_id, date, time):
-                            recognized_today.add(roll)
-                            print(f"Attendance marked for {name} ({roll}) at {time}")
-                        else:
-                            print(f"Attendance already marked for {name} ({roll}) today")
-
-            # Draw rectangle and name
-            color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
-            cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-            cv2.putText(frame, f"{name} ({roll})", (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-
-        cv2.imshow('Attendance System', frame)
-
-        key = cv2.waitKey(1) & 0xFF
-        if key == ord('q'):
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
+    pipeline.start()
+    try:
+        show_results(pipeline, overlay=overlay, preview_fps=preview_fps, headless=headless)
+    finally:
+        pipeline.stop()
+        report_fps(pipeline)
+        for cap in captures.values():
+            cap.release()
+        encoder.close()
+        writer.close()
+
     print("Attendance recognition stopped.")
 
 def get_attendance_report(date=None):
@@ -86,7 +156,7 @@ def get_attendance_report(date=None):
     Get attendance report for a specific date or overall
     """
     db = AttendanceDatabase()
-    report = db.get_attendance_report(date)
+    report = db.iter_attendance_report(date)
 
     if date:
         print(f"Attendance Report for {date}:")
@@ -102,11 +172,71 @@ def get_attendance_report(date=None):
         for name, roll, total_days in report:
             print(f"{name}\t\t{roll}\t\t{total_days}")
 
-if __name__ == "__main__":
-    import sys
+def get_percentage_report(start_date=None, end_date=None):
+    """
+    Print days present and attendance percentage per student, overall or
+    between two dates (inclusive)
+    """
+    db = AttendanceDatabase()
+    report = db.iter_attendance_percentages(start_date, end_date)
+
+    if start_date or end_date:
+        print(f"Attendance from {start_date or 'the start'} to {end_date or 'today'}:")
+    else:
+        print("Overall Attendance:")
+    print("Name\t\tRoll Number\tPresent\tPercentage")
+    print("-" * 55)
+    for name, roll, days_present, class_days, percentage in report:
+        print(f"{name}\t\t{roll}\t\t{days_present}/{class_days}\t{percentage:.1f}%")
 
-    if len(sys.argv) > 1 and sys.argv[1] == "report":
-        date = sys.argv[2] if len(sys.argv) > 2 else None
-        get_attendance_report(date)
+def batch_mark_attendance(paths, every=1, workers=DEFAULT_WORKERS):
+    """
+    Offline attendance from recorded video files or image folders, no window
+    """
+    roster = load_roster()
+
+    if len(roster.encodings) == 0:
+        print("No trained faces found. Please train some faces first.")
+        return
+
+    run_batch(paths, roster, AttendanceDatabase(), every=every, workers=workers)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Face recognition attendance")
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "report", "batch"])
+    parser.add_argument("targets", nargs="*",
+                        help="report: a date, or a start and end date (YYYY-MM-DD); batch: video files or image folders")
+    parser.add_argument("--nprobe", type=int, help="use the approximate index, scanning this many lists per face")
+    parser.add_argument("--precision", choices=PRECISIONS, default="float32",
+                        help="roster precision for the first matching pass, candidates are re-ranked exactly")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="face encoding processes (1 = in-process)")
+    parser.add_argument("--detect-every", type=int, default=5, help="run the face detector every N frames, track in between")
+    parser.add_argument("--source", action="append", dest="sources",
+                        help="camera index, RTSP URL or video file; repeat for several cameras (default 0)")
+    parser.add_argument("--every", type=int, default=1, help="batch: process every k-th video frame")
+    parser.add_argument("--metrics", dest="metrics_file",
+                        help="write per-stage timings to this file every few seconds (.prom for Prometheus, else JSON)")
+    parser.add_argument("--overlay", action="store_true", help="draw per-stage timings on the video")
+    parser.add_argument("--percent", action="store_true", help="report: overall attendance percentages")
+    parser.add_argument("--preview-fps", type=float, default=15.0, help="refresh the preview at most this often")
+    parser.add_argument("--headless", action="store_true", help="no preview window, stop with Ctrl+C")
+    args = parser.parse_args()
+
+    if args.command == "report":
+        if len(args.targets) >= 2:
+            get_percentage_report(args.targets[0], args.targets[1])
+        elif args.percent and not args.targets:
+            get_percentage_report()
+        else:
+            get_attendance_report(args.targets[0] if args.targets else None)
+    elif args.command == "batch":
+        if not args.targets:
+            parser.error("batch needs at least one video file or image folder")
+        batch_mark_attendance(args.targets, every=args.every, workers=args.workers)
     else:
-        recognize_and_mark_attendance()
+        recognize_and_mark_attendance(nprobe=args.nprobe, workers=args.workers, detect_every=args.detect_every,
+                                      sources=args.sources or [0], metrics_file=args.metrics_file,
+                                      overlay=args.overlay, preview_fps=args.preview_fps, headless=args.headless,
+                                      precision=args.precision)
@@ -0,0 +1,87 @@
+"""
+Export attendance reports as CSV or JSON lines, one row at a time.
+
+Rows are read from SQLite in chunks and written as they arrive, so an
+export of a whole term uses the same memory as one of a single day:
+
+    python report_export.py log --start 2024-01-01 --end 2024-06-30 -o term.csv
+    python report_export.py percent --format jsonl
+"""
+import sys
+import csv
+import json
+from database import AttendanceDatabase
+
+REPORTS = {
+    # name: (columns, function(db, date, start, end) returning a row iterator)
+    'daily': (['name', 'roll_number', 'date', 'time'],
+              lambda db, date, start, end: db.iter_attendance_report(date)),
+    'overall': (['name', 'roll_number', 'total_days'],
+                lambda db, date, start, end: db.iter_attendance_report()),
+    'percent': (['name', 'roll_number', 'days_present', 'class_days', 'percentage'],
+                lambda db, date, start, end: db.iter_attendance_percentages(start, end)),
+    'log': (['date', 'time', 'name', 'roll_number'],
+            lambda db, date, start, end: db.iter_attendance_log(start, end)),
+}
+
+
+def write_csv(rows, columns, f):
+    writer = csv.writer(f)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_jsonl(rows, columns, f):
+    count = 0
+    for row in rows:
+        f.write(json.dumps(dict(zip(columns, row))) + '\n')
+        count += 1
+    return count
+
+
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl}
+
+
+def export_rows(rows, columns, f, fmt='csv'):
+    """Write an iterator of rows to an open file as CSV or JSON lines, returns the number of rows"""
+    return WRITERS[fmt](rows, columns, f)
+
+
+def export_report(report, path=None, fmt='csv', db=None, date=None, start=None, end=None):
+    """
+    Stream one of REPORTS to path (stdout when None). daily takes date,
+    percent and log take an optional start and end date.
+    """
+    db = db or AttendanceDatabase()
+    columns, query = REPORTS[report]
+    rows = query(db, date, start, end)
+
+    if path is None:
+        return export_rows(rows, columns, sys.stdout, fmt)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        return export_rows(rows, columns, f, fmt)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export attendance reports as CSV or JSON lines")
+    parser.add_argument("report", choices=sorted(REPORTS))
+    parser.add_argument("--date", help="daily: the day to report (YYYY-MM-DD)")
+    parser.add_argument("--start", help="percent, log: first day (YYYY-MM-DD)")
+    parser.add_argument("--end", help="percent, log: last day (YYYY-MM-DD)")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="csv")
+    parser.add_argument("-o", "--output", help="file to write (default stdout)")
+    parser.add_argument("--db", default="attendance.db")
+    args = parser.parse_args()
+
+    if args.report == "daily" and not args.date:
+        parser.error("daily needs --date")
+
+    count = export_report(args.report, args.output, args.format, db=AttendanceDatabase(args.db),
+                          date=args.date, start=args.start, end=args.end)
+    print(f"Exported {count} rows.", file=sys.stderr)
@@ -0,0 +1,156 @@
+import os
+import json
+import struct
+import pickle
+import tempfile
+import threading
+from collections import namedtuple
+import numpy as np
+from database import open_connection
+
+MAGIC = b'ROSTER01'
+ALIGNMENT = 64
+
+Roster = namedtuple('Roster', ['version', 'ids', 'names', 'rolls', 'encodings'])
+
+
+def roster_path(db_name):
+    """The roster file lives next to the database: attendance.db -> attendance.roster"""
+    return os.path.splitext(db_name)[0] + '.roster'
+
+
+def write_roster(path, version, ids, names, rolls, encodings):
+    """
+    Write the roster as a JSON side table followed by a float32 encodings matrix.
+
+    Layout: magic, header length (uint64), JSON header, padding to 64 bytes,
+    then count x dim float32 values. The file is written to its own temporary
+    file and renamed, so concurrent rebuilds never write into each other and
+    processes that already mapped the old file keep a consistent view.
+    """
+    encodings = np.ascontiguousarray(encodings, dtype=np.float32)
+    if encodings.size == 0:
+        encodings = np.empty((0, 128), dtype=np.float32)
+
+    header = json.dumps({
+        'version': version,
+        'count': len(ids),
+        'dim': encodings.shape[1],
+        'ids': list(ids),
+        'names': list(names),
+        'rolls': list(rolls),
+    }).encode('utf-8')
+
+    data_offset = len(MAGIC) + 8 + len(header)
+    padding = (-data_offset) % ALIGNMENT
+
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp',
+                                    dir=os.path.dirname(path) or '.')
+    try:
+        os.chmod(tmp_path, 0o644)  # mkstemp creates it private, readers may run as another user
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', len(header)))
+            f.write(header)
+            f.write(b'\0' * padding)
+            f.write(encodings.tobytes())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def read_roster(path):
+    """
+    Map a roster file, returns a Roster whose encodings are a read-only memmap,
+    or None if the file is missing or damaged, so the caller rebuilds it
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            header_length, = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(header_length).decode('utf-8'))
+
+        data_offset = len(MAGIC) + 8 + header_length
+        data_offset += (-data_offset) % ALIGNMENT
+
+        # A truncated matrix makes memmap raise ValueError
+        if header['count']:
+            encodings = np.memmap(path, dtype=np.float32, mode='r', offset=data_offset,
+                                  shape=(header['count'], header['dim']))
+        else:
+            encodings = np.empty((0, header['dim']), dtype=np.float32)
+
+        return Roster(header['version'], header['ids'], header['names'], header['rolls'], encodings)
+    except (OSError, ValueError, KeyError, TypeError, struct.error):
+        return None
+
+
+def refresh_roster(db):
+    """
+    Rebuild the roster file of an AttendanceDatabase from its students table
+    """
+    # Read the version first: a change racing with the read only makes the
+    # file look stale and get rebuilt again, never the other way round
+    version = db.get_roster_version()
+
+    ids, names, rolls, encodings = [], [], [], []
+    for student_id, name, roll_number, face_encoding in db.iter_face_encodings():
+        ids.append(student_id)
+        names.append(name)
+        rolls.append(roll_number)
+        encodings.append(pickle.loads(face_encoding))
+
+    path = roster_path(db.db_name)
+    write_roster(path, version, ids, names, rolls, encodings)
+    return read_roster(path)
+
+
+def load_roster(db):
+    """
+    Return the mapped roster if it is current with the database, else rebuild it
+    """
+    roster = read_roster(roster_path(db.db_name))
+    if roster is not None and roster.version == db.get_roster_version():
+        return roster
+    return refresh_roster(db)
+
+
+class RosterCache:
+    """
+    In-process roster cache keyed on the database change counter.
+
+    Repeated loads return the cached roster without touching the roster file
+    or the students table until something commits to the database.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.conn = open_connection(db.db_name, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.key = None
+        self.roster = None
+
+    def get(self):
+        with self.lock:
+            # Take the key before loading so a commit during the load is seen next time
+            key = self.db.get_data_version(self.conn)
+            if self.roster is None or key != self.key:
+                self.roster = load_roster(self.db)
+                self.key = key
+            return self.roster
+
+
+_roster_caches = {}
+_roster_caches_lock = threading.Lock()
+
+
+def cached_roster(db):
+    """Shared RosterCache per database file"""
+    path = os.path.abspath(db.db_name)
+    with _roster_caches_lock:
+        cache = _roster_caches.get(path)
+        if cache is None:
+            cache = _roster_caches[path] = RosterCache(db)
+    return cache.get()
@@ -3,45 +3,39 @@ import numpy as np
 import sqlite3
 import pickle
 from datetime import datetime
+from functools import partial
 import os
+import database
+from database import get_connection, migrate, iter_rows, STUDENT_PAGE_SIZE
+from attendance_writer import AttendanceWriter
+from pipeline import Face, RecognitionPipeline, open_capture, is_video_file, show_results, report_fps
+from tracking import FaceTracker, IdentityCache
+from lbph_store import LBPHStore, STORE_FILE, convert_yaml_models
+from metrics import StageMetrics, DISABLED
+from face_quality import FaceQualityFilter, largest_face
 
 class SimpleFaceRecognition:
-    def __init__(self, db_name='attendance.db'):
+    def __init__(self, db_name='attendance.db', store_file=STORE_FILE):
         self.db_name = db_name
         self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        self.recognizer = cv2.face.LBPHFaceRecognizer_create()
+        # One shared histogram store for every student, labels are student ids
+        self.store = LBPHStore(store_file)
+        self.model_loaded = False
+        self.students = {}
         self.create_tables()
 
+    def connect(self):
+        return get_connection(self.db_name)
+
     def create_tables(self):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        # Same schema and migrations as AttendanceDatabase
+        migrate(self.connect())
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS students (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                roll_number TEXT UNIQUE NOT NULL
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS attendance (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                student_id INTEGER,
-                date TEXT,
-                time TEXT,
-                FOREIGN KEY (student_id) REFERENCES students (id)
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
-
-    def capture_face(self, name, roll_number):
-        """Capture face images for training"""
-        cap = cv2.VideoCapture(0)
+    def capture_face(self, name, roll_number, source=0):
+        """Capture face images for training, keeping only faces that pass the quality filter"""
+        cap = open_capture(source)
+        quality = FaceQualityFilter()
         faces = []
-        labels = []
         count = 0
 
         print(f"Capturing faces for {name} ({roll_number}). Press 'c' to capture, 'q' to quit.")
@@ -53,20 +47,23 @@ class SimpleFaceRecognition:
 
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
             detected_faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
+            box = largest_face([(y, x+w, y+h, x) for (x, y, w, h) in detected_faces])
 
-            for (x, y, w, h) in detected_faces:
-                cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
-                face_roi = gray[y:y+h, x:x+w]
-                face_roi = cv2.resize(face_roi, (100, 100))
+            if box is not None:
+                top, right, bottom, left = box
+                reason = quality.accept(gray, box)
+
+                if reason is None:
+                    cv2.rectangle(frame, (left, top), (right, bottom), (255, 0, 0), 2)
+                    face_roi = gray[top:bottom, left:right]
+                    face_roi = cv2.resize(face_roi, (100, 100))
 
-                if count < 20:
                     faces.append(face_roi)
-                    labels.append(count)
                     count += 1
                     print(f"Captured {count}/20 faces")
-
-                if count >= 20:
-                    break
+                else:
+                    cv2.rectangle(frame, (left, top), (right, bottom), (0, 165, 255), 2)
+                    cv2.putText(frame, reason, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 165, 255), 2)
 
             cv2.imshow('Capture Face', frame)
             if cv2.waitKey(1) & 0xFF == ord('q'):
@@ -77,131 +74,175 @@ class SimpleFaceRecognition:
 
         if len(faces) >= 10:
             # Add student to database
-            conn = sqlite3.connect(self.db_name)
+            conn = self.connect()
             cursor = conn.cursor()
 
             try:
-                cursor.execute('INSERT INTO students (name, roll_number) VALUES (?, ?)', (name, roll_number))
+                with conn:
+                    cursor.execute('INSERT INTO students (name, roll_number) VALUES (?, ?)', (name, roll_number))
                 student_id = cursor.lastrowid
-                conn.commit()
-
-                # Train recognizer with this student's faces
-                self.recognizer.train(faces, np.array(labels))
 
-                # Save the trained model
-                model_file = f'model_{student_id}.yml'
-                self.recognizer.save(model_file)
+                # Add this student's faces to the shared model
+                self.load_model()
+                self.store.add(student_id, faces)
+                self.model_loaded = True
+                self.students[student_id] = {'name': name, 'roll': roll_number}
 
                 print(f"Successfully added {name} ({roll_number}) to the database.")
                 return True
             except sqlite3.IntegrityError:
                 print("Roll number already exists!")
                 return False
-            finally:
-                conn.close()
         else:
             print("Not enough face images captured. Please try again.")
             return False
 
+    def load_model(self):
+        """Map the shared histogram store, converting old YAML models on first use"""
+        if self.model_loaded:
+            return True
+
+        if not self.store.exists():
+            convert_yaml_models(self.store)
+
+        self.model_loaded = self.store.load() > 0
+        return self.model_loaded
+
+    def get_all_students(self):
+        """All registered students as (id, name, roll_number)"""
+        cursor = self.connect().execute('SELECT id, name, roll_number FROM students')
+        return cursor.fetchall()
+
+    def search_students(self, search=None, present_on=None, absent_on=None, offset=0, limit=STUDENT_PAGE_SIZE):
+        """One page of students, searched and filtered in SQL"""
+        return database.search_students(self.connect(), search, present_on, absent_on, offset, limit)
+
+    def count_students(self, search=None, present_on=None, absent_on=None):
+        return database.count_students(self.connect(), search, present_on, absent_on)
+
     def load_all_models(self):
-        """Load all trained models"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, name, roll_number FROM students')
-        students = cursor.fetchall()
-        conn.close()
-
-        self.student_models = {}
-        for student_id, name, roll in students:
-            model_file = f'model_{student_id}.yml'
-            if os.path.exists(model_file):
-                recognizer = cv2.face.LBPHFaceRecognizer_create()
-                recognizer.read(model_file)
-                self.student_models[student_id] = {
-                    'recognizer': recognizer,
-                    'name': name,
-                    'roll': roll
-                }
-
-        return len(self.student_models)
-
-    def recognize_and_mark_attendance(self):
-        """Real-time face recognition and attendance marking"""
-        if not hasattr(self, 'student_models') or not self.student_models:
+        """Load the shared model and the students it can recognize"""
+        students = self.get_all_students()
+
+        self.students = {student_id: {'name': name, 'roll': roll} for student_id, name, roll in students}
+
+        if not self.load_model():
+            return 0
+
+        labels = np.unique(self.store.labels)
+        return sum(1 for label in labels if int(label) in self.students)
+
+    def detect_faces(self, packet, tracker, identities, metrics=DISABLED):
+        """Pipeline stage: Haar cascade face detection, tracked between detections"""
+        gray = cv2.cvtColor(packet.frame, cv2.COLOR_BGR2GRAY)
+        packet.data['gray'] = gray
+
+        def detect():
+            with metrics.timer('face_locations'):
+                return [(y, x+w, y+h, x) for (x, y, w, h) in self.face_cascade.detectMultiScale(gray, 1.3, 5)]
+
+        tracks = tracker.update(gray, detect)
+        packet.faces = [Face(track.box, track.id) for track in tracks]
+        identities.apply(packet.faces, {track.id for track in tracks})
+        return packet
+
+    def recognize_faces(self, packet, writer, identities, confident_threshold=60):
+        """Pipeline stage: identify faces not already known from their track, and queue attendance"""
+        gray = packet.data['gray']
+
+        for face in packet.faces:
+            if face.cached:
+                continue
+
+            top, right, bottom, left = face.box
+            face_roi = gray[top:bottom, left:right]
+            face_roi = cv2.resize(face_roi, (100, 100))
+
+            # One predict against the shared model, label is the student id
+            student_id, confidence = self.store.predict(face_roi)
+            best_match = None
+            if confidence < 80:  # Confidence threshold
+                best_match = self.students.get(student_id)
+
+            if best_match:
+                face.student_id = student_id
+                face.name = best_match['name']
+                face.roll = best_match['roll']
+                face.distance = confidence
+                identities.remember(face, confident=confidence < confident_threshold)
+
+                # Mark attendance; the writer ignores students already marked today by any camera
+                now = datetime.now()
+                date = now.strftime("%Y-%m-%d")
+                time = now.strftime("%H:%M:%S")
+
+                writer.mark(student_id, date, time, face.name, face.roll)
+            else:
+                identities.remember(face)
+
+        return packet
+
+    def recognize_and_mark_attendance(self, detect_every=5, sources=(0,), metrics_file=None, overlay=False,
+                                      preview_fps=15.0, headless=False):
+        """
+        Real-time face recognition and attendance marking
+
+        sources is a list of camera indexes, RTSP URLs or video files, each
+        with its own capture and detection threads sharing one histogram
+        store and attendance writer.
+
+        Stage timings are written to metrics_file (.prom or JSON) and/or
+        drawn on the video with overlay; neither is collected by default.
+        The preview refreshes at most preview_fps times a second from its
+        own thread, or is skipped entirely when headless.
+        """
+        if not self.model_loaded or not self.students:
             print("No trained models found. Please train some faces first.")
             return
 
-        cap = cv2.VideoCapture(0)
-        recognized_today = set()
+        captures = {source: open_capture(source) for source in sources}
 
-        print("Starting attendance recognition. Press 'q' to quit.")
+        metrics = StageMetrics(path=metrics_file) if metrics_file or overlay else DISABLED
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        # Attendance is committed off the frame loop, in batches
+        writer = AttendanceWriter(self.db_name, metrics=metrics)
+        writer.start()
 
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
-
-            for (x, y, w, h) in faces:
-                face_roi = gray[y:y+h, x:x+w]
-                face_roi = cv2.resize(face_roi, (100, 100))
-
-                # Try to recognize with each model
-                best_match = None
-                best_confidence = 100
-
-                for student_id, model_data in self.student_models.items():
-                    recognizer = model_data['recognizer']
-                    label, confidence = recognizer.predict(face_roi)
-
-                    if confidence < best_confidence and confidence < 80:  # Confidence threshold
-                        best_confidence = confidence
-                        best_match = model_data
-
-                if best_match:
-                    name = best_match['name']
-                    roll = best_match['roll']
-                    student_id = list(self.student_models.keys())[list(self.student_models.values()).index(best_match)]
-
-                    # Mark attendance if not already marked today
-                    if roll not in recognized_today:
-                        now = datetime.now()
-                        date = now.strftime("%Y-%m-%d")
-                        time = now.strftime("%H:%M:%S")
-
-                        conn = sqlite3.connect(self.db_name)
-                        cursor = conn.cursor()
-
-                        # Check if attendance already marked
-                        cursor.execute('SELECT id FROM attendance WHERE student_id = ? AND date = ?', (student_id, date))
-                        if not cursor.fetchone():
-                            cursor.execute('INSERT INTO attendance (student_id, date, time) VALUES (?, ?, ?)', (student_id, date, time))
-                            conn.commit()
-                            recognized_today.add(roll)
-                            print(f"Attendance marked for {name} ({roll}) at {time}")
-
-                        conn.close()
-
-                    cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-                    cv2.putText(frame, f"{name} ({roll})", (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-                else:
-                    cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 0, 255), 2)
-                    cv2.putText(frame, "Unknown", (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+        def make_stages(source):
+            # Who each tracked face is, so known faces are not re-predicted
+            identities = IdentityCache()
+            return [
+                ('detect', partial(self.detect_faces, tracker=FaceTracker(detect_every), identities=identities,
+                                   metrics=metrics)),
+                ('recognize', partial(self.recognize_faces, writer=writer, identities=identities)),
+            ]
 
-            cv2.imshow('Attendance System', frame)
+        # Capture, detection and recognition run as separate threads
+        pipeline = RecognitionPipeline(captures, make_stages,
+                                       realtime_sources=[source for source in sources if is_video_file(source)],
+                                       metrics=metrics)
 
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+        print("Starting attendance recognition. Press 'q' to quit.")
+
+        pipeline.start()
+        try:
+            show_results(pipeline, overlay=overlay, preview_fps=preview_fps, headless=headless)
+        finally:
+            pipeline.stop()
+            report_fps(pipeline)
+            for cap in captures.values():
+                cap.release()
+            writer.close()
 
-        cap.release()
-        cv2.destroyAllWindows()
         print("Attendance recognition stopped.")
 
     def get_attendance_report(self, date=None):
         """Get attendance report"""
-        conn = sqlite3.connect(self.db_name)
+        return list(self.iter_attendance_report(date))
+
+    def iter_attendance_report(self, date=None):
+        """Stream the attendance report, fetching rows in chunks"""
+        conn = self.connect()
         cursor = conn.cursor()
 
         if date:
@@ -212,17 +253,15 @@ class SimpleFaceRecognition:
                 ORDER BY s.name
             ''', (date,))
         else:
+            # Totals come from the summary table, not the attendance history
             cursor.execute('''
-                SELECT s.name, s.roll_number, COUNT(a.id) as total_days
+                SELECT s.name, s.roll_number, COALESCE(sa.days_present, 0) as total_days
                 FROM students s
-                LEFT JOIN attendance a ON s.id = a.student_id
-                GROUP BY s.id
+                LEFT JOIN student_attendance sa ON s.id = sa.student_id
                 ORDER BY s.name
             ''')
 
-        report = cursor.fetchall()
-        conn.close()
-        return report
+        return iter_rows(cursor)
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,104 @@
+import sqlite3
+import time
+from datetime import datetime
+import pytest
+from attendance_writer import AttendanceWriter
+from database import AttendanceDatabase
+
+# The writer's DayState tracks today, earlier days are always let through
+TODAY = datetime.now().strftime("%Y-%m-%d")
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = AttendanceDatabase(str(tmp_path / 'attendance.db'))
+    for roll in ('R1', 'R2'):
+        db.add_student(f'Student {roll}', roll)
+    return db
+
+
+def start_writer(db, results, **kwargs):
+    writer = AttendanceWriter(db.db_name, flush_interval=0.01, retry_delay=0,
+                              on_result=lambda event, marked: results.append((event.student_id, marked)),
+                              **kwargs)
+    writer.start()
+    return writer
+
+
+def marked_rows(db):
+    return db.connect().execute('SELECT student_id, date FROM attendance ORDER BY student_id').fetchall()
+
+
+def failing(times):
+    """mark_attendance_many that raises "database is locked" `times` times, then writes"""
+    original = AttendanceDatabase.mark_attendance_many
+    calls = []
+
+    def mark_attendance_many(self, marks):
+        calls.append(list(marks))
+        if len(calls) <= times:
+            raise sqlite3.OperationalError('database is locked')
+        return original(self, marks)
+
+    return mark_attendance_many, calls
+
+
+def test_marks_each_student_once(db):
+    results = []
+    writer = start_writer(db, results)
+    assert writer.mark(1, TODAY, '09:00:00')
+    assert not writer.mark(1, TODAY, '09:00:01')
+    assert writer.mark(2, TODAY, '09:00:02')
+    writer.close()
+
+    assert results == [(1, True), (2, True)]
+    assert marked_rows(db) == [(1, TODAY), (2, TODAY)]
+
+
+def test_locked_database_is_retried(db, monkeypatch):
+    mark_attendance_many, calls = failing(times=2)
+    monkeypatch.setattr(AttendanceDatabase, 'mark_attendance_many', mark_attendance_many)
+
+    results = []
+    writer = start_writer(db, results, retries=3)
+    writer.mark(1, TODAY, '09:00:00')
+    writer.close()
+
+    assert len(calls) == 3
+    assert results == [(1, True)]
+    assert marked_rows(db) == [(1, TODAY)]
+
+
+def test_failed_batch_releases_its_students(db, monkeypatch):
+    mark_attendance_many, calls = failing(times=2)
+    monkeypatch.setattr(AttendanceDatabase, 'mark_attendance_many', mark_attendance_many)
+
+    results = []
+    writer = start_writer(db, results, retries=2)
+    writer.mark(1, TODAY, '09:00:00')
+    writer.close()
+
+    # Nothing was written, and the student is no longer held as marked
+    assert len(calls) == 2
+    assert results == []
+    assert marked_rows(db) == []
+    assert writer.day_state.claim(1, TODAY)
+
+
+def test_student_is_queued_again_after_a_failed_batch(db, monkeypatch):
+    mark_attendance_many, calls = failing(times=1)
+    monkeypatch.setattr(AttendanceDatabase, 'mark_attendance_many', mark_attendance_many)
+
+    results = []
+    writer = start_writer(db, results, retries=1)
+    writer.mark(1, TODAY, '09:00:00')
+
+    # Claimed until the failed batch is given up, then a new sighting is queued
+    deadline = time.monotonic() + 5
+    while not writer.mark(1, TODAY, '09:05:00'):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    writer.close()
+
+    assert results == [(1, True)]
+    assert db.connect().execute('SELECT time FROM attendance').fetchall() == [('09:05:00',)]
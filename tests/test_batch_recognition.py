@@ -0,0 +1,62 @@
+import os
+from datetime import datetime
+import cv2
+import numpy as np
+import batch_recognition
+from batch_recognition import collect_sightings, first_sighting_marks, run_batch
+from database import AttendanceDatabase
+from roster_file import Roster
+
+
+def timestamp(text):
+    return datetime.strptime(text, "%Y-%m-%d %H:%M:%S").timestamp()
+
+
+def test_earliest_sighting_per_student_per_day():
+    first_seen = {}
+    collect_sightings(first_seen, [(1, timestamp('2024-05-02 09:10:00')),
+                                   (1, timestamp('2024-05-01 09:30:00')),
+                                   (2, timestamp('2024-05-01 09:00:00'))])
+    # Results of a second job arrive later but hold earlier sightings
+    collect_sightings(first_seen, [(1, timestamp('2024-05-01 09:05:00')),
+                                   (1, timestamp('2024-05-02 09:00:00'))])
+
+    assert first_sighting_marks(first_seen) == [
+        (2, '2024-05-01', '09:00:00'),
+        (1, '2024-05-01', '09:05:00'),
+        (1, '2024-05-02', '09:00:00'),
+    ]
+
+
+def test_batch_spanning_several_days_marks_each_day(tmp_path, monkeypatch):
+    db = AttendanceDatabase(str(tmp_path / 'attendance.db'))
+    ids = [db.add_student(name, roll) for name, roll in (('Asha', 'R1'), ('Ravi', 'R2'))]
+    roster = Roster(1, ids, ['Asha', 'Ravi'], ['R1', 'R2'], np.zeros((2, 128), dtype=np.float32))
+
+    # Each photo's first pixel says who is in it, its mtime when it was taken
+    photos = [
+        ('a.png', ids[0], '2024-05-01 09:30:00'),
+        ('b.png', ids[0], '2024-05-01 09:05:00'),
+        ('c.png', ids[1], '2024-05-01 09:10:00'),
+        ('d.png', ids[0], '2024-05-02 09:20:00'),
+        ('e.png', ids[1], '2024-05-03 08:55:00'),
+    ]
+    photo_dir = tmp_path / 'photos'
+    photo_dir.mkdir()
+    for name, student_id, taken in photos:
+        path = str(photo_dir / name)
+        cv2.imwrite(path, np.full((8, 8, 3), student_id, dtype=np.uint8))
+        os.utime(path, (timestamp(taken), timestamp(taken)))
+
+    monkeypatch.setattr(batch_recognition, '_identify', lambda frame: [int(frame[0, 0, 0])])
+
+    marks = run_batch([str(photo_dir)], roster, db, workers=1)
+
+    assert marks == [
+        (ids[0], '2024-05-01', '09:05:00'),
+        (ids[1], '2024-05-01', '09:10:00'),
+        (ids[0], '2024-05-02', '09:20:00'),
+        (ids[1], '2024-05-03', '08:55:00'),
+    ]
+    rows = db.connect().execute('SELECT student_id, date, time FROM attendance ORDER BY date, time').fetchall()
+    assert rows == marks
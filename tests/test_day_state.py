@@ -0,0 +1,67 @@
+import threading
+import pytest
+from attendance_writer import DayState
+from database import AttendanceDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = AttendanceDatabase(str(tmp_path / 'attendance.db'))
+    for roll in ('R1', 'R2', 'R3'):
+        db.add_student(f'Student {roll}', roll)
+    return db
+
+
+def test_preloads_students_already_marked_that_day(db):
+    db.mark_attendance(1, '2024-05-01', '09:00:00')
+
+    state = DayState(db.db_name, date='2024-05-01')
+
+    assert not state.claim(1, '2024-05-01')
+    assert state.claim(2, '2024-05-01')
+    assert not state.claim(2, '2024-05-01')
+
+
+def test_swaps_to_the_new_days_set_at_midnight(db):
+    state = DayState(db.db_name, date='2024-05-01')
+    assert state.claim(1, '2024-05-01')
+    assert state.claim(2, '2024-05-01')
+    # Another process already marked student 3 just after midnight
+    db.mark_attendance(3, '2024-05-02', '00:00:05')
+
+    assert state.claim(1, '2024-05-02')
+
+    assert state.date == '2024-05-02'
+    assert not state.claim(1, '2024-05-02')
+    assert not state.claim(3, '2024-05-02')
+    # Marked yesterday, not yet today
+    assert state.claim(2, '2024-05-02')
+
+
+def test_earlier_days_are_let_through(db):
+    state = DayState(db.db_name, date='2024-05-02')
+    assert state.claim(1, '2024-05-02')
+
+    # A late event from before midnight: the database drops it if it is a repeat
+    assert state.claim(1, '2024-05-01')
+    assert state.claim(1, '2024-05-01')
+    assert state.date == '2024-05-02'
+
+
+def test_one_claim_per_student_across_threads_at_midnight(db):
+    state = DayState(db.db_name, date='2024-05-01')
+    results = []
+    barrier = threading.Barrier(8)
+
+    def claim():
+        barrier.wait()
+        results.append(state.claim(1, '2024-05-02'))
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+    assert state.date == '2024-05-02'
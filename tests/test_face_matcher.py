@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from face_matcher import FaceMatcher, QuantizedMatcher, make_matcher
+
+
+def brute_force(known, faces, tolerance):
+    """Nearest known encoding per face by a plain Python scan"""
+    indices, best = [], []
+    for face in faces:
+        distances = [np.linalg.norm(encoding - face) for encoding in known]
+        nearest = int(np.argmin(distances))
+        indices.append(nearest if distances[nearest] <= tolerance else -1)
+        best.append(distances[nearest])
+    return np.array(indices), np.array(best)
+
+
+@pytest.fixture
+def roster():
+    rng = np.random.default_rng(0)
+    known = rng.normal(0.0, 0.09, size=(500, 128)).astype(np.float32)
+    # Near-duplicates of known students, plus strangers far from everyone
+    truth = rng.choice(len(known), 40)
+    faces = np.vstack([known[truth] + rng.normal(0.0, 0.02, size=(40, 128)),
+                       rng.normal(0.0, 0.3, size=(10, 128))]).astype(np.float32)
+    return known, faces
+
+
+def test_face_matcher_matches_brute_force(roster):
+    known, faces = roster
+    expected_indices, expected_distances = brute_force(known, faces, 0.6)
+
+    indices, distances = FaceMatcher(known, tolerance=0.6).match(faces)
+
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(distances, expected_distances, rtol=1e-4)
+    assert np.all(indices[-10:] == -1)
+
+
+@pytest.mark.parametrize('precision', ['float16', 'int8'])
+def test_quantized_matcher_matches_brute_force(roster, precision):
+    known, faces = roster
+    expected_indices, expected_distances = brute_force(known, faces, 0.6)
+
+    # A small chunk size exercises the chunked scan
+    matcher = QuantizedMatcher(known, tolerance=0.6, precision=precision, chunk_size=64)
+    indices, distances = matcher.match(faces)
+
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(distances, expected_distances, rtol=1e-4)
+    assert matcher.nbytes < known.nbytes
+
+
+def test_quantized_matcher_reranks_whole_small_roster(roster):
+    known, faces = roster
+    matcher = QuantizedMatcher(known[:5], tolerance=10.0, rerank=10)
+    expected_indices, _ = brute_force(known[:5], faces, 10.0)
+
+    indices, _ = matcher.match(faces)
+
+    np.testing.assert_array_equal(indices, expected_indices)
+
+
+@pytest.mark.parametrize('precision', ['float32', 'float16', 'int8'])
+def test_empty_roster_and_no_faces(precision):
+    matcher = make_matcher([], precision=precision)
+    indices, distances = matcher.match(np.zeros((2, 128), dtype=np.float32))
+    assert list(indices) == [-1, -1]
+    assert np.all(np.isinf(distances))
+
+    indices, _ = make_matcher(np.ones((3, 128)), precision=precision).match([])
+    assert len(indices) == 0
+
+
+def test_make_matcher_rejects_unknown_precision():
+    with pytest.raises(ValueError):
+        make_matcher(np.ones((3, 128)), precision='int4')
@@ -0,0 +1,90 @@
+import pickle
+import numpy as np
+import pytest
+from database import MIGRATIONS, AttendanceDatabase, get_schema_version, migrate, open_connection
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def schema(conn):
+    return conn.execute('SELECT type, name, sql FROM sqlite_master ORDER BY type, name').fetchall()
+
+
+def contents(conn):
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+    return {table: conn.execute(f'SELECT * FROM {table} ORDER BY 1').fetchall() for table in tables}
+
+
+@pytest.fixture
+def legacy_conn(tmp_path):
+    """A database as SimpleFaceRecognition created it: no face_encoding column, no version, duplicate marks"""
+    conn = open_connection(str(tmp_path / 'legacy.db'))
+    with conn:
+        conn.execute('CREATE TABLE students (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                     'name TEXT NOT NULL, roll_number TEXT UNIQUE NOT NULL)')
+        conn.execute('CREATE TABLE attendance (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                     'student_id INTEGER, date TEXT, time TEXT)')
+        conn.executemany('INSERT INTO students (name, roll_number) VALUES (?, ?)',
+                         [('Asha', 'R1'), ('Ravi', 'R2')])
+        conn.executemany('INSERT INTO attendance (student_id, date, time) VALUES (?, ?, ?)', [
+            (1, '2024-05-01', '09:00:00'),
+            (1, '2024-05-01', '09:30:00'),
+            (2, '2024-05-01', '09:10:00'),
+            (1, '2024-05-02', '09:05:00'),
+        ])
+    yield conn
+    conn.close()
+
+
+def test_new_database_reaches_latest_version(tmp_path):
+    db = AttendanceDatabase(str(tmp_path / 'new.db'))
+    assert get_schema_version(db.connect()) == LATEST
+
+
+def test_migrating_twice_changes_nothing(tmp_path):
+    db = AttendanceDatabase(str(tmp_path / 'twice.db'))
+    student_id = db.add_student('Asha', 'R1', pickle.dumps(np.zeros(128)))
+    db.mark_attendance(student_id, '2024-05-01', '09:00:00')
+    conn = db.connect()
+    before_schema, before_contents = schema(conn), contents(conn)
+
+    assert migrate(conn) == LATEST
+    assert migrate(conn) == LATEST
+    assert schema(conn) == before_schema
+    assert contents(conn) == before_contents
+
+
+def test_legacy_database_upgrades_in_place(legacy_conn):
+    assert migrate(legacy_conn) == LATEST
+
+    columns = [row[1] for row in legacy_conn.execute('PRAGMA table_info(students)')]
+    assert 'face_encoding' in columns
+    # The earliest of the duplicate marks is kept
+    assert legacy_conn.execute('SELECT student_id, date, time FROM attendance ORDER BY id').fetchall() == [
+        (1, '2024-05-01', '09:00:00'), (2, '2024-05-01', '09:10:00'), (1, '2024-05-02', '09:05:00')]
+    # Summaries are backfilled from the history
+    assert legacy_conn.execute('SELECT * FROM daily_attendance ORDER BY date').fetchall() == [
+        ('2024-05-01', 2), ('2024-05-02', 1)]
+    assert legacy_conn.execute('SELECT * FROM student_attendance ORDER BY student_id').fetchall() == [
+        (1, 2), (2, 1)]
+
+    before_schema, before_contents = schema(legacy_conn), contents(legacy_conn)
+    assert migrate(legacy_conn) == LATEST
+    assert schema(legacy_conn) == before_schema
+    assert contents(legacy_conn) == before_contents
+
+
+@pytest.mark.parametrize('version, description, apply', MIGRATIONS)
+def test_each_migration_can_run_twice(legacy_conn, version, description, apply):
+    # Bring the database up to this step, then apply the step once more
+    for _, _, step_apply in MIGRATIONS[:version]:
+        with legacy_conn:
+            step_apply(legacy_conn.cursor())
+    before_schema, before_contents = schema(legacy_conn), contents(legacy_conn)
+
+    with legacy_conn:
+        apply(legacy_conn.cursor())
+
+    assert schema(legacy_conn) == before_schema
+    assert contents(legacy_conn) == before_contents
@@ -0,0 +1,71 @@
+import queue
+import threading
+from pipeline import END, put_end, put_latest
+
+
+def drain(q):
+    items = []
+    while not q.empty():
+        items.append(q.get_nowait())
+    return items
+
+
+def test_put_latest_drops_the_oldest_item():
+    q = queue.Queue(maxsize=2)
+    for frame in range(5):
+        put_latest(q, frame)
+
+    assert drain(q) == [3, 4]
+
+
+def test_put_latest_keeps_everything_while_there_is_room():
+    q = queue.Queue(maxsize=3)
+    put_latest(q, 'a')
+    put_latest(q, 'b')
+
+    assert drain(q) == ['a', 'b']
+
+
+def test_put_latest_never_blocks_against_a_full_queue_and_a_consumer():
+    q = queue.Queue(maxsize=1)
+    stop = threading.Event()
+
+    def consume():
+        while not stop.is_set():
+            try:
+                q.get(timeout=0.01)
+            except queue.Empty:
+                pass
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    try:
+        for frame in range(1000):
+            put_latest(q, frame)
+    finally:
+        stop.set()
+        consumer.join()
+
+    assert q.qsize() <= 1
+
+
+def test_put_end_gives_up_once_stopping():
+    q = queue.Queue(maxsize=1)
+    q.put_nowait('frame')
+    stop = threading.Event()
+    stop.set()
+
+    put_end(q, stop)
+
+    assert drain(q) == ['frame']
+
+
+def test_put_end_waits_for_room():
+    q = queue.Queue(maxsize=1)
+    q.put_nowait('frame')
+    stop = threading.Event()
+    threading.Timer(0.05, q.get_nowait).start()
+
+    put_end(q, stop)
+
+    assert drain(q) == [END]
@@ -0,0 +1,61 @@
+import os
+import pickle
+import threading
+import numpy as np
+from database import AttendanceDatabase
+from roster_file import load_roster, read_roster, roster_path, write_roster
+
+
+def roster_rows(count, seed):
+    rng = np.random.default_rng(seed)
+    ids = list(range(1, count + 1))
+    return ids, [f'Student {i}' for i in ids], [f'R{i}' for i in ids], rng.normal(size=(count, 128))
+
+
+def test_concurrent_rebuilds_never_mix(tmp_path):
+    path = str(tmp_path / 'attendance.roster')
+    # Different sizes, so a file assembled from two writers would not parse
+    sizes = [50, 400, 1200, 3000]
+    barrier = threading.Barrier(len(sizes))
+    errors = []
+
+    def rebuild(count):
+        barrier.wait()
+        try:
+            for _ in range(10):
+                write_roster(path, count, *roster_rows(count, seed=count))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=rebuild, args=(count,)) for count in sizes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    roster = read_roster(path)
+    count = roster.version
+    ids, names, rolls, encodings = roster_rows(count, seed=count)
+    assert roster.ids == ids and roster.names == names and roster.rolls == rolls
+    np.testing.assert_array_equal(roster.encodings, encodings.astype(np.float32))
+    assert os.listdir(tmp_path) == ['attendance.roster']
+
+
+def test_damaged_roster_file_is_rebuilt(tmp_path):
+    db = AttendanceDatabase(str(tmp_path / 'attendance.db'))
+    for i in range(3):
+        db.add_student(f'Student {i}', f'R{i}', pickle.dumps(np.full(128, float(i))))
+    load_roster(db)
+    path = roster_path(db.db_name)
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    for damaged in (data[:-100], data[:40], b''):
+        with open(path, 'wb') as f:
+            f.write(damaged)
+        assert read_roster(path) is None
+
+        roster = load_roster(db)
+        assert roster.rolls == ['R0', 'R1', 'R2']
+        assert roster.encodings[2][0] == 2.0
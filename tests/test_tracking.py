@@ -0,0 +1,75 @@
+import numpy as np
+from pipeline import Face
+from tracking import FaceTracker, IdentityCache
+
+BOX = (100, 200, 220, 100)  # top, right, bottom, left
+
+
+def frame_with(patch, seed=0):
+    gray = np.random.default_rng(seed).integers(0, 256, (480, 640), dtype=np.uint8)
+    top, right, bottom, left = BOX
+    gray[top:bottom, left:right] = patch
+    return gray
+
+
+def patch(seed):
+    return np.random.default_rng(seed).integers(0, 256, (120, 100), dtype=np.uint8)
+
+
+def test_same_face_keeps_its_track_across_detections():
+    tracker = FaceTracker(detect_every=3)
+    gray = frame_with(patch(1))
+
+    ids = [[track.id for track in tracker.update(gray, lambda: [BOX])] for _ in range(7)]
+
+    assert ids == [[1]] * 7
+    assert tracker.detections == 3
+
+
+def test_different_face_in_the_same_spot_gets_a_new_track():
+    tracker = FaceTracker(detect_every=100)
+    first = tracker.update(frame_with(patch(1)), lambda: [BOX])
+    assert [track.id for track in first] == [1]
+
+    # Someone else steps into the same box: template matching fails, the
+    # detector finds a face at the same place, and it must not inherit id 1
+    second = tracker.update(frame_with(patch(2)), lambda: [BOX])
+
+    assert [track.id for track in second] == [2]
+    assert tracker.detections == 2
+
+
+def test_face_swap_on_a_scheduled_detection_frame_gets_a_new_track():
+    tracker = FaceTracker(detect_every=1)
+    tracker.update(frame_with(patch(1)), lambda: [BOX])
+
+    tracks = tracker.update(frame_with(patch(2)), lambda: [BOX])
+
+    assert [track.id for track in tracks] == [2]
+
+
+def test_identity_is_not_inherited_by_the_next_person():
+    tracker = FaceTracker(detect_every=100)
+    identities = IdentityCache(known_ttl=60.0)
+
+    track, = tracker.update(frame_with(patch(1)), lambda: [BOX])
+    face = Face(track.box, track.id)
+    assert identities.apply([face], {track.id}) == [face]
+    face.student_id, face.name, face.roll = 7, 'Asha', 'R7'
+    identities.remember(face)
+
+    track, = tracker.update(frame_with(patch(2)), lambda: [BOX])
+    newcomer = Face(track.box, track.id)
+
+    assert identities.apply([newcomer], {track.id}) == [newcomer]
+    assert not newcomer.cached and newcomer.student_id is None
+
+
+def test_empty_scene_is_checked_on_the_detection_schedule():
+    tracker = FaceTracker(detect_every=5)
+    gray = frame_with(patch(1))
+
+    for _ in range(20):
+        tracker.update(gray, lambda: [])
+
+    assert tracker.detections == 4
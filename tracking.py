@@ -0,0 +1,195 @@
+import itertools
+import threading
+import time
+import cv2
+import numpy as np
+
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    if bottom <= top or right <= left:
+        return 0.0
+    inter = (bottom - top) * (right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return inter / float(area_a + area_b - inter)
+
+
+class Track:
+    """A face followed across frames"""
+
+    def __init__(self, track_id, box, gray):
+        self.id = track_id
+        self.box = box
+        self.template = None
+        self.age = 0  # Frames since the track was created
+        self.set_box(box, gray)
+
+    def set_box(self, box, gray):
+        self.box = clip_box(box, gray.shape)
+        top, right, bottom, left = self.box
+        self.template = gray[top:bottom, left:right].copy()
+
+
+def clip_box(box, shape):
+    top, right, bottom, left = (int(v) for v in box)
+    height, width = shape[:2]
+    return max(0, top), min(width, right), min(height, bottom), max(0, left)
+
+
+class FaceTracker:
+    """
+    Runs the face detector only every `detect_every` frames, or as soon as a
+    track is lost, and follows known faces in between with template matching
+    in a small window around their last position.
+
+    Detections are associated with existing tracks by IoU so a face keeps
+    its track id (and anything cached on it) across detections. A track
+    whose template no longer matches is lost: it is left out of the
+    association, so whoever is now in that spot gets a new track id.
+    """
+
+    def __init__(self, detect_every=5, min_iou=0.3, min_score=0.6, search_margin=0.5):
+        self.detect_every = max(1, detect_every)
+        self.min_iou = min_iou
+        self.min_score = min_score
+        self.search_margin = search_margin
+        self.tracks = []
+        self.frames_since_detection = None
+        self.ids = itertools.count(1)
+        self.detections = 0
+        self.frames = 0
+
+    def needs_detection(self):
+        # An empty scene is looked at again on the same schedule, not every frame
+        return self.frames_since_detection is None or self.frames_since_detection + 1 >= self.detect_every
+
+    def update(self, gray, detect):
+        """
+        Advance to a new frame, calling detect() (returning boxes) only when a
+        detection is due. Returns the current tracks.
+        """
+        self.frames += 1
+        # Follow on detection frames too, so a face that changed under its
+        # box is never handed the old track id by IoU alone
+        lost = self.follow(gray)
+        if lost or self.needs_detection():
+            # A lost face is looked for again on this frame
+            self.apply_detections(gray, detect(), lost)
+        else:
+            self.frames_since_detection += 1
+
+        for track in self.tracks:
+            track.age += 1
+        return self.tracks
+
+    def apply_detections(self, gray, boxes, lost=()):
+        self.detections += 1
+        self.frames_since_detection = 0
+
+        # Greedy association, best overlaps first; lost tracks end here
+        pairs = sorted(((iou(track.box, box), t, d)
+                        for t, track in enumerate(self.tracks) if track not in lost
+                        for d, box in enumerate(boxes)), reverse=True)
+        matched_tracks, matched_boxes = set(), set()
+        for overlap, t, d in pairs:
+            if overlap < self.min_iou:
+                break
+            if t in matched_tracks or d in matched_boxes:
+                continue
+            self.tracks[t].set_box(boxes[d], gray)
+            matched_tracks.add(t)
+            matched_boxes.add(d)
+
+        tracks = [track for t, track in enumerate(self.tracks) if t in matched_tracks]
+        for d, box in enumerate(boxes):
+            if d not in matched_boxes:
+                tracks.append(Track(next(self.ids), box, gray))
+        self.tracks = tracks
+
+    def follow(self, gray):
+        """Move every track to its best template match, returns the tracks that were lost"""
+        lost = []
+        for track in self.tracks:
+            top, right, bottom, left = track.box
+            height, width = bottom - top, right - left
+            if height <= 0 or width <= 0:
+                lost.append(track)
+                continue
+
+            pad_y, pad_x = int(height * self.search_margin), int(width * self.search_margin)
+            y0, x0 = max(0, top - pad_y), max(0, left - pad_x)
+            window = gray[y0:bottom + pad_y, x0:right + pad_x]
+            if window.shape[0] < height or window.shape[1] < width:
+                lost.append(track)
+                continue
+
+            scores = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+            if not np.isfinite(score) or score < self.min_score:
+                lost.append(track)
+                continue
+
+            track.set_box((y0 + dy, x0 + dx + width, y0 + dy + height, x0 + dx), gray)
+
+        return lost
+
+
+class IdentityCache:
+    """
+    Identity of each live track, so a face that has been recognized is not
+    re-encoded and re-matched on every frame.
+
+    Confident matches are kept for `known_ttl` seconds and unknown faces for
+    `unknown_ttl` seconds before the face is checked again. When a track is
+    lost (its template stops matching, e.g. someone else steps into the
+    spot) FaceTracker ends it and the face found there gets a new track id,
+    so apply() drops the old entry and the face is identified afresh.
+    """
+
+    def __init__(self, known_ttl=10.0, unknown_ttl=2.0):
+        self.known_ttl = known_ttl
+        self.unknown_ttl = unknown_ttl
+        self.entries = {}  # track id -> (identity or None, expiry time)
+        self.lock = threading.Lock()
+
+    def apply(self, faces, live_track_ids=None):
+        """
+        Fill in cached identities on faces and forget tracks that ended.
+        Returns the faces that still need to be identified.
+        """
+        now = time.monotonic()
+        pending = []
+
+        with self.lock:
+            if live_track_ids is not None:
+                for track_id in list(self.entries):
+                    if track_id not in live_track_ids:
+                        del self.entries[track_id]
+
+            for face in faces:
+                entry = self.entries.get(face.track_id)
+                if entry is None or entry[1] <= now:
+                    pending.append(face)
+                    continue
+
+                face.cached = True
+                if entry[0] is not None:
+                    face.student_id, face.name, face.roll = entry[0]
+
+        return pending
+
+    def remember(self, face, confident=True):
+        """Cache the result of identifying a face; uncertain matches are not cached"""
+        if face.track_id is None or not confident:
+            return
+
+        if face.known:
+            identity, ttl = (face.student_id, face.name, face.roll), self.known_ttl
+        else:
+            identity, ttl = None, self.unknown_ttl
+
+        with self.lock:
+            self.entries[face.track_id] = (identity, time.monotonic() + ttl)
@@ -3,10 +3,20 @@ import face_recognition
 import pickle
 import os
 from database import AttendanceDatabase
+from ann_index import update_index
+from face_encoder import FaceEncoder, DEFAULT_WORKERS, crop_face
+from face_quality import FaceQualityFilter, largest_face
+from pipeline import open_capture
+from roster_file import cached_roster
 
-def capture_face(name, roll_number):
+def capture_face(name, roll_number, workers=DEFAULT_WORKERS, source=0):
     """
     Capture face images for a student and save encodings
+
+    Faces are only detected while the camera is open, and only sharp, well
+    lit, frontal faces that differ from those already taken are kept (see
+    face_quality.py); the kept crops are then encoded in one batch across
+    `workers` processes.
     """
     db = AttendanceDatabase()
 
@@ -15,8 +25,9 @@ def capture_face(name, roll_number):
         print(f"Student with roll number {roll_number} already exists!")
         return False
 
-    cap = cv2.VideoCapture(0)
-    face_encodings = []
+    cap = open_capture(source)
+    quality = FaceQualityFilter()
+    face_crops = []
     count = 0
 
     print(f"Capturing faces for {name} ({roll_number}). Press 'c' to capture, 'q' to quit.")
@@ -29,21 +40,22 @@ def capture_face(name, roll_number):
         # Convert to RGB for face_recognition
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
-        # Detect faces
-        face_locations = face_recognition.face_locations(rgb_frame)
-        face_encodings_frame = face_recognition.face_encodings(rgb_frame, face_locations)
-
-        for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings_frame):
-            # Draw rectangle around face
-            cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+        # Detect faces, the student is the one closest to the camera
+        box = largest_face(face_recognition.face_locations(rgb_frame))
 
-            # Store encoding
-            face_encodings.append(face_encoding)
-            count += 1
-            print(f"Captured {count}/10 faces")
+        if box is not None:
+            top, right, bottom, left = box
+            reason = quality.accept(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), box)
 
-            if count >= 10:
-                break
+            if reason is None:
+                # Keep the face for batch encoding
+                face_crops.append(crop_face(rgb_frame, box))
+                count += 1
+                print(f"Captured {count}/10 faces")
+                cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+            else:
+                cv2.rectangle(frame, (left, top), (right, bottom), (0, 165, 255), 2)
+                cv2.putText(frame, reason, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 165, 255), 2)
 
         cv2.imshow('Capture Face', frame)
 
@@ -54,6 +66,9 @@ def capture_face(name, roll_number):
     cap.release()
     cv2.destroyAllWindows()
 
+    with FaceEncoder(min(workers, len(face_crops))) as encoder:
+        face_encodings = encoder.encode_crops(face_crops)
+
     if len(face_encodings) >= 5:  # Require at least 5 faces
         # Average the encodings
         avg_encoding = sum(face_encodings) / len(face_encodings)
@@ -66,6 +81,9 @@ def capture_face(name, roll_number):
 
         if student_id:
             print(f"Successfully added {name} ({roll_number}) to the database.")
+
+            # Keep the approximate index in step with the roster
+            update_index(avg_encoding, roll_number)
             return True
         else:
             print("Failed to add student to database.")
@@ -74,28 +92,21 @@ def capture_face(name, roll_number):
         print("Not enough face images captured. Please try again.")
         return False
 
+def load_roster():
+    """
+    Load all known students as a Roster (version, ids, names, rolls, encodings)
+    from the memory-mapped roster file. The file is rebuilt from the database
+    when it is missing or stale, and repeated loads in one process are free
+    until the database changes.
+    """
+    return cached_roster(AttendanceDatabase())
+
 def load_known_faces():
     """
     Load all known face encodings from database
     """
-    db = AttendanceDatabase()
-    students = db.get_all_students()
-
-    known_encodings = []
-    known_names = []
-    known_rolls = []
-
-    for student in students:
-        student_id, name, roll_number = student
-        student_data = db.get_student_by_roll(roll_number)
-
-        if student_data and student_data[3]:  # face_encoding exists
-            encoding = pickle.loads(student_data[3])
-            known_encodings.append(encoding)
-            known_names.append(name)
-            known_rolls.append(roll_number)
-
-    return known_encodings, known_names, known_rolls
+    roster = load_roster()
+    return roster.encodings, list(roster.names), list(roster.rolls)
 
 if __name__ == "__main__":
     # Example usage